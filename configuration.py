@@ -67,6 +67,8 @@ class GAConfiguration:
 
     min_testcase_size: int = 8
 
+    genome_storage: str = 'objects'  # 'arrays' keeps the statements of test cases in NumPy rows, see core/genome.py
+
     # selection config
     tournament_size: int = 5
 
@@ -93,6 +95,73 @@ class GAConfiguration:
 
     population: int = 40
 
+    steady_state: bool = False  # breed a new offspring whenever an evaluation slot frees up
+
+    # budget config, 0 is unlimited
+    max_evaluations: int = 0  # simulator runs, cached fitness values do not count
+
+    max_wall_time: float = 0.0  # seconds
+
+    target_unique_bugs: int = 0
+
+    # checkpoint config
+    checkpoint_path: str | None = None  # file the search state is periodically written to, None disables it
+
+    checkpoint_interval: int = 1  # generations between two checkpoints
+
+    # island config
+    islands: int = 1  # > 1 runs this many populations in separate processes
+
+    migration_interval: int = 5  # generations between two migrations
+
+    migration_size: int = 2  # non-dominated individuals sent to the next island
+
+    # evaluation config
+    eval_workers: int = 1  # > 1 evaluates each population on a process pool of this size
+
+    max_in_flight: int = 1  # > 1 overlaps this many Simulation.sim_async calls on an event loop
+
+    sim_batch_size: int = 0  # chromosomes per sim_batch call of backends that support it, 0 for the whole population
+
+    fitness_cache_size: int = 4096  # 0 disables the exact-match fitness cache
+
+    eval_store_path: str | None = None  # sqlite file of evaluations shared across runs, None disables it
+
+    eval_store_batch_size: int = 64
+
+    ads_version: str = ''  # stored evaluations are only reused for the same ADS build
+
+    # archive config
+    archive_path: str | None = None  # directory of the memory-mapped archive of every evaluation, None disables it
+
+    archive_segment_rows: int = 65536  # evaluations per segment file
+
+    archive_flush_size: int = 256  # evaluations appended between two commits
+
+    # result config
+    result_queue_size: int = 1024  # records buffered for the writer thread before the search blocks
+
+    result_flush_size: int = 256  # records written between two flushes
+
+    result_flush_interval: float = 1.0  # seconds the writer thread waits for more records
+
+    # metrics config
+    metrics_port: int = 0  # > 0 serves the metrics in the Prometheus text format on http://127.0.0.1:<port>/metrics
+
+    metrics_path: str | None = None  # file the metrics are periodically rewritten to, None disables it
+
+    metrics_interval: float = 5.0  # seconds between two rewrites of metrics_path
+
+    # trace config
+    trace_path: str | None = None  # Chrome trace-event JSON of the run, written at its end, None disables tracing
+
+    trace_buffer_size: int = 100000  # only the latest spans are kept
+
+    # logging config
+    log_sampling: dict = field(default_factory=dict)  # category -> log one in N records, e.g. {'offspring': 10}
+
+    profile_phases: bool = False  # time the phases of the search, summarised in the log and results/phases_<ts>.json
+
 
 
 
@@ -1,17 +1,94 @@
 from __future__ import annotations
 from core.chromosome import TestCaseChromosome
+from core.simulation import Simulation
+from core.cache import FitnessCache
+from core.store import EvaluationStore
+from core.checkpoint import write_checkpoint, read_checkpoint
+from core.codec import encode_chromosome, decode_chromosome
+from core.budget import SearchBudget
+from core.sink import ResultSink
+from core.archive import ScenarioArchive
 from configuration import configuration as config
 
 import core.factory as fc
 from operators.selection import TournamentSelection
 from operators.crossover import MultiPointCrossover
-from utils import randomness, fnds, utils
+from utils import randomness, fnds, profiler, tracer
+from utils.metrics import METRICS
+from utils.lsh import BugIndex
+from utils.logs import LazySource
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat, islice
+from collections import deque
 import numpy as np
+import asyncio
 import logging
-import ast
 import time
 import os
-import difflib
+
+_worker_simulation = None
+
+_EVALUATIONS = METRICS.counter('evaluations_total', "Evaluated individuals, by whether the fitness was simulated "
+                               "or already known", ('mode', 'source'))
+_EVALUATION_RATE = METRICS.gauge('evaluations_per_second', "Simulations per second over the last generation")
+_SIMULATION_SECONDS = METRICS.histogram('simulation_seconds', "Duration of one simulation")
+_SIMULATION_QUEUE = METRICS.gauge('simulation_queue_depth', "Simulations requested whose result was not consumed yet")
+_RESULT_QUEUE = METRICS.gauge('result_queue_depth', "Records waiting for the result writer thread")
+_CACHE_HIT_RATIO = METRICS.gauge('fitness_cache_hit_ratio', "Share of fitness lookups answered by the cache")
+_COLLISIONS = METRICS.counter('collisions_total', "Evaluated individuals that collided", ('kind',))
+_UNIQUE_BUGS = METRICS.gauge('unique_bugs', "Collisions with NPCs that are not near duplicates of an earlier one")
+_ITERATION = METRICS.gauge('iteration', "Generation being evaluated")
+_OPERATOR_EVALUATIONS = METRICS.counter('operator_evaluations_total', "Evaluated individuals made by an operator",
+                                        ('operator',))
+_OPERATOR_COLLISIONS = METRICS.counter('operator_collisions_total', "Collisions with NPCs of individuals made by "
+                                       "an operator", ('operator',))
+_OPERATOR_UNIQUE_BUGS = METRICS.counter('operator_unique_bugs_total', "Unique bugs found by individuals made by "
+                                        "an operator", ('operator',))
+
+
+def _init_worker(simulation, trace_capacity: int = 0):
+    global _worker_simulation
+    _worker_simulation = simulation
+    if trace_capacity > 0:
+        tracer.TRACER.enable(trace_capacity)
+
+
+def _trace_simulation(chrom: TestCaseChromosome, start: float, seconds: float):
+    if tracer.TRACER.enabled:
+        tracer.TRACER.complete('simulation', 'simulation', start, seconds, {'chromosome': chrom.canonical_hash()[:16]})
+
+
+def _timed_sim(simulation: Simulation, chrom: TestCaseChromosome, is_avfuzzer: bool) -> tuple[list, float]:
+    # timed where it runs, so the latency of pooled simulations leaves out the time spent queued
+    start = time.perf_counter()
+    fitness = simulation.sim(chrom, is_avfuzzer)
+    seconds = time.perf_counter() - start
+    _trace_simulation(chrom, start, seconds)
+    return fitness, seconds
+
+
+async def _timed_sim_async(simulation: Simulation, chrom: TestCaseChromosome, is_avfuzzer: bool) -> tuple[list, float]:
+    start = time.perf_counter()
+    fitness = await simulation.sim_async(chrom, is_avfuzzer)
+    seconds = time.perf_counter() - start
+    _trace_simulation(chrom, start, seconds)
+    return fitness, seconds
+
+
+def _simulate(chrom: TestCaseChromosome, is_avfuzzer: bool) -> tuple[list, float, list]:
+    # the trace events of the worker travel back with its result
+    return *_timed_sim(_worker_simulation, chrom, is_avfuzzer), tracer.TRACER.drain()
+
+
+def _unpack_simulation(result: tuple) -> tuple[list, float]:
+    fitness, seconds, *events = result
+    if events:
+        tracer.TRACER.extend(events[0])
+    return fitness, seconds
+
+
+def collides_with_npc(fitness) -> bool:
+    return fitness[0] == 0 and fitness[1] < 6.0
 
 
 class SearchAlgorithm:
@@ -23,8 +100,28 @@ class SearchAlgorithm:
     ):
 
         self.chromosome_factory = chromosome_factory
-        self.simulation = None
+        self.simulation: Simulation | None = None
         self.iteration = 0
+        self._executor: ProcessPoolExecutor | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        # simulations submitted to a sim_batch backend, per is_avfuzzer, that run at the next wait
+        self._batch: dict[bool, list[tuple[TestCaseChromosome, asyncio.Future]]] = {}
+        self._sim_slots: asyncio.Semaphore | None = None
+        self._result_sink: ResultSink | None = None
+        self.fitness_cache = FitnessCache(config.ga_config.fitness_cache_size)
+        self.budget = SearchBudget(config.ga_config.max_evaluations, config.ga_config.max_wall_time,
+                                   config.ga_config.target_unique_bugs)
+        self.evaluation_store: EvaluationStore | None = None
+        if config.ga_config.eval_store_path is not None:
+            self.evaluation_store = EvaluationStore(config.ga_config.eval_store_path, config.ga_config.ads_version,
+                                                    config.ga_config.eval_store_batch_size)
+
+        self.archive: ScenarioArchive | None = None
+        if config.ga_config.archive_path is not None:
+            self.archive = ScenarioArchive(config.ga_config.archive_path, writable=True,
+                                           segment_rows=config.ga_config.archive_segment_rows,
+                                           max_statements=config.ga_config.max_testcase_size,
+                                           flush_size=config.ga_config.archive_flush_size)
 
         self.selection = TournamentSelection()
         self.crossover = MultiPointCrossover()
@@ -38,39 +135,83 @@ class SearchAlgorithm:
         self.collision_with_npc_count = 0
         self.collision_with_boundary_count = 0
         self.unique_bug = []
+        self.bug_index = BugIndex()
         self.unique_bug_count = []
 
         # avfuzzer
         self.avfuzzer_best_y = 999
         self.local_population = []
 
-    def generate_tests(self):
-        self.population = self.generate_random_population()
-        self.eval_population()
-        self.population = self.get_survivals()
-        while self.iteration < config.ga_config.iteration:
+        if config.ga_config.profile_phases:
+            profiler.TIMER.enable()
+        if config.ga_config.metrics_port > 0:
+            METRICS.serve(config.ga_config.metrics_port)
+        if config.ga_config.metrics_path is not None:
+            METRICS.export(config.ga_config.metrics_path, config.ga_config.metrics_interval)
+        if config.ga_config.trace_path is not None:
+            tracer.TRACER.enable(config.ga_config.trace_buffer_size)
+
+    def generate_tests(self, resume: str | None = None):
+        if config.ga_config.steady_state:
+            return self.steady_state_generate_tests(resume)
+
+        self.budget.start()
+        if resume is not None:
+            self.load_checkpoint(resume, 'ga')
+        elif not self.start_population():
+            self.shutdown()
+            return None
+        while self.iteration < config.ga_config.iteration and not self.budget_exhausted():
             self.evolve()
 
             self.history.append(self.chrom2string(self.population[0]))
             self.unique_bug_count.append(len(self.unique_bug))
+            exhausted = self.budget.exhausted(len(self.unique_bug))
             # restart if needed
 
-            if self.iteration > 2 and self.unique_bug_count[-1] == self.unique_bug_count[-2]:
+            if not exhausted and self.iteration > 2 and self.unique_bug_count[-1] == self.unique_bug_count[-2]:
                 self.logger.info("restart....")
                 self.population = self.generate_random_population()
 
             self.iteration += 1
+            with profiler.TIMER.phase('checkpoint'):
+                self.checkpoint('ga', force=exhausted)
+            profiler.TIMER.end_generation(self.iteration)
+        self.checkpoint('ga', finished=True)
+        self.report_phases()
+        self.shutdown()
         return self.population[0]
 
-    def avfuzzer_generate_tests(self):
-        self.population = self.avfuzzer_generate_random_population()
-        self.eval_population(is_avfuzzer=True)
-        while self.iteration < config.ga_config.iteration:
+    def start_population(self) -> bool:
+        """Evaluate a random population, False if the search budget ran out before any individual was"""
+        self.population = self.generate_random_population()
+        self.eval_population()
+        if not self.population:
+            self.logger.info("the search budget ran out before any individual was evaluated")
+            return False
+        with profiler.TIMER.phase('survival'):
+            self.population = self.get_survivals()
+        profiler.TIMER.end_generation(self.iteration)
+        return True
+
+    def avfuzzer_generate_tests(self, resume: str | None = None):
+        self.budget.start()
+        if resume is not None:
+            self.load_checkpoint(resume, 'avfuzzer')
+        else:
+            self.population = self.avfuzzer_generate_random_population()
+            self.eval_population(is_avfuzzer=True)
+            profiler.TIMER.end_generation(self.iteration)
+        while self.iteration < config.ga_config.iteration and not self.budget_exhausted():
             self.avfuzzer_evolve()
             self.iteration += 1
             self.history.append(self.population[0].fitness)
             self.unique_bug_count.append(len(self.unique_bug))
             # restart
+            if self.budget_exhausted():
+                self.checkpoint('avfuzzer', force=True)
+                profiler.TIMER.end_generation(self.iteration)
+                break
             if self.iteration > 5 and sum(self.history[-5:]) / 5 < self.population[0].fitness:
                 self.logger.info("restart....")
                 self.avfuzzer_generate_random_population()
@@ -86,6 +227,80 @@ class SearchAlgorithm:
                     self.population.append(self.local_fuzz())
                     self.population.sort(key=lambda x: x.fitness)
                     self.population = self.population[: config.ga_config.population]
+            with profiler.TIMER.phase('checkpoint'):
+                self.checkpoint('avfuzzer')
+            profiler.TIMER.end_generation(self.iteration)
+        self.checkpoint('avfuzzer', finished=True)
+        self.report_phases()
+        self.shutdown()
+
+    def budget_exhausted(self) -> bool:
+        reason = self.budget.exhaustion_reason(len(self.unique_bug))
+        if reason is not None:
+            self.logger.info("search budget exhausted after %s", reason)
+        return reason is not None
+
+    def checkpoint(self, mode: str, force: bool = False, finished: bool = False):
+        if config.ga_config.checkpoint_path is None:
+            return
+        if not force and not finished and self.iteration % config.ga_config.checkpoint_interval != 0:
+            return
+        if self.evaluation_store is not None:
+            self.evaluation_store.flush()
+        if self.archive is not None:
+            self.archive.flush()
+        if self._result_sink is not None:
+            # the results on disk must not lag behind the counters in the checkpoint
+            self._result_sink.flush()
+        write_checkpoint(config.ga_config.checkpoint_path, {
+            'mode': mode,
+            # a finished run is not picked up again by main.py
+            'finished': finished,
+            'population': [encode_chromosome(chrom) for chrom in self.population],
+            'local_population': [encode_chromosome(chrom) for chrom in self.local_population],
+            'iteration': self.iteration,
+            'history': self.history,
+            'unique_bug': self.unique_bug,
+            'unique_bug_count': self.unique_bug_count,
+            'collision_with_npc_count': self.collision_with_npc_count,
+            'collision_with_boundary_count': self.collision_with_boundary_count,
+            'avfuzzer_best_y': self.avfuzzer_best_y,
+            'start_time': self.start_time,
+            'evaluations': self.budget.evaluations,
+            'fitness_cache': self.fitness_cache.items(),
+            'random_state': randomness.RNG.getstate(),
+            'numpy_random_state': np.random.get_state(),
+        })
+        self.logger.info("checkpoint of iteration %d written to %s", self.iteration, config.ga_config.checkpoint_path)
+
+    def load_checkpoint(self, path: str, mode: str):
+        state = read_checkpoint(path)
+        if state['mode'] != mode:
+            raise ValueError("{} is a checkpoint of a {} run, not of a {} run".format(path, state['mode'], mode))
+
+        test_factory = self.chromosome_factory.test_factory
+        self.population = [decode_chromosome(data, test_factory) for data in state['population']]
+        self.local_population = [decode_chromosome(data, test_factory) for data in state['local_population']]
+        self.iteration = state['iteration']
+        self.history = state['history']
+        self.unique_bug = state['unique_bug']
+        self.bug_index = BugIndex()
+        for bug in self.unique_bug:
+            self.bug_index.add(bug)
+        _UNIQUE_BUGS.set(len(self.unique_bug))
+        self.unique_bug_count = state['unique_bug_count']
+        self.collision_with_npc_count = state['collision_with_npc_count']
+        self.collision_with_boundary_count = state['collision_with_boundary_count']
+        self.avfuzzer_best_y = state['avfuzzer_best_y']
+        self.start_time = state['start_time']
+        # the wall clock budget restarts with the search, the evaluation budget carries over
+        self.budget.evaluations = state['evaluations']
+        self.fitness_cache.update(state['fitness_cache'])
+        randomness.RNG.setstate(state['random_state'])
+        np.random.set_state(state['numpy_random_state'])
+        if state.get('finished', False):
+            self.logger.info("%s was written by a run that finished", path)
+        self.logger.info("resumed from iteration %d of %s", self.iteration, path)
 
     def local_fuzz(self):
         local_iteration = 0
@@ -93,35 +308,45 @@ class SearchAlgorithm:
             new_generation = []
 
             while len(new_generation) < config.ga_config.population:
-                parent1 = self.selection.avfuzzer_select(self.local_population, 2)[0]
-                parent2 = self.selection.avfuzzer_select(self.local_population, 2)[0]
-                offspring1 = parent1.clone()
-                offspring2 = parent2.clone()
+                with profiler.TIMER.phase('selection'):
+                    parent1 = self.selection.avfuzzer_select(self.local_population, 2)[0]
+                    parent2 = self.selection.avfuzzer_select(self.local_population, 2)[0]
+                with profiler.TIMER.phase('clone'):
+                    offspring1 = parent1.clone()
+                    offspring2 = parent2.clone()
 
-                self.logger.info("parent 1: %s", self.chrom2string(parent1))
-                self.logger.info("parent 2: %s", self.chrom2string(parent2))
+                self.logger.info("parent 1: %s", LazySource(parent1), extra={'category': 'parent'})
+                self.logger.info("parent 2: %s", LazySource(parent2), extra={'category': 'parent'})
 
                 if randomness.next_float() <= config.ga_config.avfuzzer_crossover_rate:
-                    self.crossover.avfuzzer_crossover(offspring1, offspring2)
+                    with profiler.TIMER.phase('crossover'):
+                        self.crossover.avfuzzer_crossover(offspring1, offspring2)
 
-                self.logger.info("offspring 1 after crossover: %s", self.chrom2string(offspring1))
-                self.logger.info("offspring 2 after crossover: %s", self.chrom2string(offspring2))
+                self.logger.info("offspring 1 after crossover: %s", LazySource(offspring1),
+                                 extra={'category': 'offspring'})
+                self.logger.info("offspring 2 after crossover: %s", LazySource(offspring2),
+                                 extra={'category': 'offspring'})
 
                 if randomness.next_float() <= config.ga_config.avfuzzer_mutation_rate:
-                    offspring1.avfuzzer_mutation()
+                    with profiler.TIMER.phase('mutation'):
+                        offspring1.avfuzzer_mutation()
 
                 if randomness.next_float() <= config.ga_config.avfuzzer_mutation_rate:
-                    offspring2.avfuzzer_mutation()
+                    with profiler.TIMER.phase('mutation'):
+                        offspring2.avfuzzer_mutation()
 
-                self.logger.info("offspring 1 after mutation: %s", self.chrom2string(offspring1))
-                self.logger.info("offspring 2 after mutation: %s", self.chrom2string(offspring2))
+                self.logger.info("offspring 1 after mutation: %s", LazySource(offspring1),
+                                 extra={'category': 'offspring'})
+                self.logger.info("offspring 2 after mutation: %s", LazySource(offspring2),
+                                 extra={'category': 'offspring'})
 
                 new_generation.append(offspring1)
                 new_generation.append(offspring2)
 
             self.eval_population(new_generation, is_avfuzzer=True)
             population = self.local_population + new_generation
-            population.sort(key=lambda x: x.fitness)
+            with profiler.TIMER.phase('survival'):
+                population.sort(key=lambda x: x.fitness)
             self.local_population = population[: config.ga_config.population]
             local_iteration += 1
             self.iteration += 1
@@ -129,36 +354,42 @@ class SearchAlgorithm:
 
     def avfuzzer_generate_random_population(self):
         population = []
-        while len(population) < config.ga_config.population:
-            chrom = self.chromosome_factory.avfuzzer_generate_chromosome()
-            population.append(chrom)
+        with profiler.TIMER.phase('random_population'):
+            while len(population) < config.ga_config.population:
+                chrom = self.chromosome_factory.avfuzzer_generate_chromosome()
+                population.append(chrom)
         return population
 
     def avfuzzer_evolve(self):
         new_generation = []
 
         while len(new_generation) < config.ga_config.population:
-            parent1 = self.selection.avfuzzer_select(self.population, 2)[0]
-            parent2 = self.selection.avfuzzer_select(self.population, 2)[0]
-            offspring1 = parent1.clone()
-            offspring2 = parent2.clone()
+            with profiler.TIMER.phase('selection'):
+                parent1 = self.selection.avfuzzer_select(self.population, 2)[0]
+                parent2 = self.selection.avfuzzer_select(self.population, 2)[0]
+            with profiler.TIMER.phase('clone'):
+                offspring1 = parent1.clone()
+                offspring2 = parent2.clone()
 
-            self.logger.info("parent 1: %s", self.chrom2string(parent1))
-            self.logger.info("parent 2: %s", self.chrom2string(parent2))
+            self.logger.info("parent 1: %s", LazySource(parent1), extra={'category': 'parent'})
+            self.logger.info("parent 2: %s", LazySource(parent2), extra={'category': 'parent'})
 
             if randomness.next_float() <= config.ga_config.avfuzzer_crossover_rate:
-                self.crossover.avfuzzer_crossover(offspring1, offspring2)
+                with profiler.TIMER.phase('crossover'):
+                    self.crossover.avfuzzer_crossover(offspring1, offspring2)
 
-            self.logger.info("offspring 1 after crossover: %s", self.chrom2string(offspring1))
-            self.logger.info("offspring 2 after crossover: %s", self.chrom2string(offspring2))
+            self.logger.info("offspring 1 after crossover: %s", LazySource(offspring1), extra={'category': 'offspring'})
+            self.logger.info("offspring 2 after crossover: %s", LazySource(offspring2), extra={'category': 'offspring'})
 
             if randomness.next_float() <= config.ga_config.avfuzzer_mutation_rate:
-                offspring1.avfuzzer_mutation()
+                with profiler.TIMER.phase('mutation'):
+                    offspring1.avfuzzer_mutation()
             if randomness.next_float() <= config.ga_config.avfuzzer_mutation_rate:
-                offspring2.avfuzzer_mutation()
+                with profiler.TIMER.phase('mutation'):
+                    offspring2.avfuzzer_mutation()
 
-            self.logger.info("offspring 1 after mutation: %s", self.chrom2string(offspring1))
-            self.logger.info("offspring 2 after mutation: %s", self.chrom2string(offspring2))
+            self.logger.info("offspring 1 after mutation: %s", LazySource(offspring1), extra={'category': 'offspring'})
+            self.logger.info("offspring 2 after mutation: %s", LazySource(offspring2), extra={'category': 'offspring'})
 
             new_generation.append(offspring1)
             new_generation.append(offspring2)
@@ -166,68 +397,277 @@ class SearchAlgorithm:
         self.eval_population(new_generation, is_avfuzzer=True)
         population = self.population + new_generation
 
-        population.sort(key=lambda x: x.fitness)
+        with profiler.TIMER.phase('survival'):
+            population.sort(key=lambda x: x.fitness)
         self.population = population[: config.ga_config.population]
 
     def random_generation(self):
-        while self.iteration < config.ga_config.iteration:
+        self.budget.start()
+        while self.iteration < config.ga_config.iteration and not self.budget_exhausted():
             self.population = self.generate_random_population()
             self.eval_population(self.population)
             self.iteration += 1
+            profiler.TIMER.end_generation(self.iteration)
+        self.report_phases()
+        self.shutdown()
         return self.population[0]
 
     def generate_random_population(self):
         population = []
-        while len(population) < config.ga_config.population:
-            chrom = self.chromosome_factory.generate_chromosome()
-            population.append(chrom)
+        with profiler.TIMER.phase('random_population'):
+            while len(population) < config.ga_config.population:
+                chrom = self.chromosome_factory.generate_chromosome()
+                population.append(chrom)
         return population
 
     def eval_population(self, population: None | list = None, is_avfuzzer: bool = False):
         pop = self.population if population is None else population
+        with tracer.TRACER.span('evaluation', individuals=len(pop)):
+            with profiler.TIMER.phase('fitness_lookup'):
+                keys = [chrom.canonical_hash() for chrom in pop]
+                known = self.lookup_fitness(keys)
+                # identical individuals of one population, e.g. clones and elites, are simulated once
+                unknown = {}
+                for chrom, key, fitness in zip(pop, keys, known):
+                    if fitness is None:
+                        unknown.setdefault(key, chrom)
+            simulated = self.simulate_population(list(unknown.values()), is_avfuzzer)
+            # metrics are always recorded here, in submission order, so parallel runs count like serial ones
+            mode = 'avfuzzer' if is_avfuzzer else 'ga'
+            pending = len(unknown)
+            started = time.perf_counter()
+            evaluated = 0
+            fresh = {}
+            for chrom, key, fitness in zip(pop, keys, known):
+                if self.budget.exhausted(len(self.unique_bug)):
+                    break
+                if fitness is None:
+                    # the duplicates of an individual simulated earlier in this population share its result
+                    fitness = fresh.get(key)
+                if fitness is None:
+                    _SIMULATION_QUEUE.set(pending)
+                    # with workers this is the time spent waiting for the next result
+                    with profiler.TIMER.phase('simulation'):
+                        fitness, seconds = next(simulated)
+                    pending -= 1
+                    self.budget.count()
+                    profiler.TIMER.count('simulations')
+                    _SIMULATION_SECONDS.observe(seconds)
+                    _EVALUATIONS.inc(mode=mode, source='simulation')
+                    self.store_fitness(key, fitness, is_avfuzzer)
+                    fresh[key] = fitness
+                else:
+                    profiler.TIMER.count('known_fitness')
+                    _EVALUATIONS.inc(mode=mode, source='known')
+                    self.logger.info("fitness of individual already known: %s", LazySource(chrom),
+                                     extra={'category': 'evaluation'})
+                chrom.fitness = fitness
+                self.logger.info("its fitness score is: %s", str(chrom.fitness))
+                with profiler.TIMER.phase('record_metric'):
+                    self.record_metric(chrom, is_avfuzzer)
+                if is_avfuzzer:
+                    chrom.fitness = chrom.fitness[1]
+                evaluated += 1
+            # cancels the simulations that are still pending once the budget ran out
+            simulated.close()
+            _SIMULATION_QUEUE.set(0)
+            self.update_rates(len(unknown) - pending, time.perf_counter() - started)
+            if evaluated < len(pop):
+                self.logger.info("dropping %d individuals that were not evaluated", len(pop) - evaluated)
+                del pop[evaluated:]
+            self.logger.info("fitness cache: %d hits, %d misses", self.fitness_cache.hits, self.fitness_cache.misses)
+
+    def update_rates(self, simulations: int, seconds: float):
+        if seconds > 0:
+            _EVALUATION_RATE.set(simulations / seconds)
+        lookups = self.fitness_cache.hits + self.fitness_cache.misses
+        if lookups:
+            _CACHE_HIT_RATIO.set(self.fitness_cache.hits / lookups)
+        _ITERATION.set(self.iteration)
+
+    def lookup_fitness(self, keys: list[str]) -> list:
+        known = [self.fitness_cache.get(key) for key in keys]
+        if self.evaluation_store is not None:
+            stored = self.evaluation_store.get_many([key for key, fitness in zip(keys, known) if fitness is None])
+            for i, key in enumerate(keys):
+                if known[i] is None and key in stored:
+                    known[i] = stored[key]
+                    self.fitness_cache.put(key, known[i])
+        return known
+
+    def store_fitness(self, key: str, fitness: list, is_avfuzzer: bool = False):
+        self.fitness_cache.put(key, fitness)
+        if self.evaluation_store is not None:
+            self.evaluation_store.put(key, fitness, 'avfuzzer' if is_avfuzzer else 'ga')
+
+    def simulate_population(self, pop: list[TestCaseChromosome], is_avfuzzer: bool = False):
+        batched = callable(getattr(self.simulation, 'sim_batch', None))
+        if not batched and config.ga_config.max_in_flight <= 1 and config.ga_config.eval_workers <= 1:
+            return self.simulate_serially(pop, is_avfuzzer)
+
         for chrom in pop:
-            self.logger.info("evaluate individual: %s", self.chrom2string(chrom))
-            chrom.fitness = self.simulation.sim(chrom, is_avfuzzer)
-            self.logger.info("its fitness score is: %s", str(chrom.fitness))
-            self.record_metric(chrom, is_avfuzzer)
-            if is_avfuzzer:
-                chrom.fitness = chrom.fitness[1]
+            self.logger.info("evaluate individual: %s", LazySource(chrom), extra={'category': 'evaluation'})
+        if batched:
+            return self.simulate_in_batches(pop, is_avfuzzer)
+        if config.ga_config.max_in_flight > 1:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+            return self.simulate_concurrently(pop, is_avfuzzer)
+        return self.collect_simulations(self.get_executor().map(_simulate, pop, repeat(is_avfuzzer)))
+
+    @staticmethod
+    def collect_simulations(results):
+        try:
+            for result in results:
+                yield _unpack_simulation(result)
+        finally:
+            # closing the map iterator cancels the simulations that did not start
+            results.close()
+
+    def simulate_concurrently(self, pop: list[TestCaseChromosome], is_avfuzzer: bool = False):
+        # at most max_in_flight simulations run ahead of the consumer, they progress while the loop awaits the oldest
+        tasks = deque()
+        pending = iter(pop)
+        try:
+            while True:
+                for chrom in islice(pending, config.ga_config.max_in_flight - len(tasks)):
+                    tasks.append(self._loop.create_task(_timed_sim_async(self.simulation, chrom, is_avfuzzer)))
+                if not tasks:
+                    return
+                yield self._loop.run_until_complete(tasks.popleft())
+        finally:
+            if tasks:
+                for task in tasks:
+                    task.cancel()
+                self._loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+
+    def simulate_in_batches(self, pop: list[TestCaseChromosome], is_avfuzzer: bool = False):
+        batch_size = config.ga_config.sim_batch_size if config.ga_config.sim_batch_size > 0 else len(pop)
+        for start in range(0, len(pop), batch_size):
+            batch = pop[start: start + batch_size]
+            started = time.perf_counter()
+            results = list(self.simulation.sim_batch(batch, is_avfuzzer))
+            # a batch is one session, each of its scenarios is charged an equal share
+            seconds = (time.perf_counter() - started) / max(1, len(batch))
+            for fitness in results:
+                yield fitness, seconds
+
+    def simulate_serially(self, pop: list[TestCaseChromosome], is_avfuzzer: bool = False):
+        for chrom in pop:
+            self.logger.info("evaluate individual: %s", LazySource(chrom), extra={'category': 'evaluation'})
+            yield _timed_sim(self.simulation, chrom, is_avfuzzer)
+
+    def get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # workers trace too when the search does
+            trace_capacity = config.ga_config.trace_buffer_size if tracer.TRACER.enabled else 0
+            self._executor = ProcessPoolExecutor(max_workers=config.ga_config.eval_workers,
+                                                 initializer=_init_worker,
+                                                 initargs=(self.simulation, trace_capacity))
+        return self._executor
+
+    def submit_simulation(self, chrom: TestCaseChromosome, is_avfuzzer: bool = False) -> asyncio.Future:
+        """Start simulating chrom the way simulate_population would, the future completes in wait_simulations"""
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+        if callable(getattr(self.simulation, 'sim_batch', None)):
+            future = self._loop.create_future()
+            self._batch.setdefault(is_avfuzzer, []).append((chrom, future))
+            return future
+        if config.ga_config.eval_workers > 1:
+            return asyncio.wrap_future(self.get_executor().submit(_simulate, chrom, is_avfuzzer), loop=self._loop)
+        return self._loop.create_task(self.simulate_in_slot(chrom, is_avfuzzer))
+
+    async def simulate_in_slot(self, chrom: TestCaseChromosome, is_avfuzzer: bool = False) -> tuple[list, float]:
+        if self._sim_slots is None:
+            # created on the loop it guards, at most max_in_flight sim_async calls overlap
+            self._sim_slots = asyncio.Semaphore(max(1, config.ga_config.max_in_flight))
+        async with self._sim_slots:
+            return await _timed_sim_async(self.simulation, chrom, is_avfuzzer)
+
+    def wait_simulations(self, futures) -> set[asyncio.Future]:
+        """Wait until at least one of the submitted simulations completes and return those that did"""
+        batches, self._batch = self._batch, {}
+        for is_avfuzzer, batch in batches.items():
+            results = self.simulate_in_batches([chrom for chrom, _ in batch], is_avfuzzer)
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+        done, _ = self._loop.run_until_complete(asyncio.wait(futures, return_when=asyncio.FIRST_COMPLETED))
+        return done
+
+    def cancel_simulations(self, futures):
+        self._batch.clear()
+        for future in futures:
+            future.cancel()
+        if futures:
+            self._loop.run_until_complete(asyncio.gather(*futures, return_exceptions=True))
+
+    def get_result_sink(self) -> ResultSink:
+        if self._result_sink is None:
+            self._result_sink = ResultSink(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../results"),
+                                           config.ga_config.result_queue_size, config.ga_config.result_flush_size,
+                                           config.ga_config.result_flush_interval)
+        return self._result_sink
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        if self._loop is not None:
+            self._loop.close()
+            self._loop = None
+            self._sim_slots = None
+        if self.evaluation_store is not None:
+            self.evaluation_store.flush()
+        if self.archive is not None:
+            self.archive.flush()
+        if self._result_sink is not None:
+            self._result_sink.close()
+            self._result_sink = None
+        METRICS.stop()
+        if tracer.TRACER.enabled:
+            tracer.TRACER.dump(config.ga_config.trace_path)
+            self.logger.info("trace of the last %d spans written to %s", len(tracer.TRACER), config.ga_config.trace_path)
 
     def record_metric(self, chrom, is_avfuzzer: bool = False):
+        scenario = self.chrom2string(chrom)
+        operators = chrom.operators
+        for operator in operators:
+            _OPERATOR_EVALUATIONS.inc(operator=operator)
         # collision with NPC
-        if chrom.fitness[0] == 0 and chrom.fitness[1] < 6.0:
+        if collides_with_npc(chrom.fitness):
             self.collision_with_npc_count += 1
-            if len(self.unique_bug) == 0:
-                self.unique_bug.append(self.chrom2string(chrom))
-
-            else:
-                unique_flag = 1
-                for bug in self.unique_bug:
-                    if difflib.SequenceMatcher(None, bug, self.chrom2string(chrom)).quick_ratio() > 0.8:
-                        unique_flag = 0
-                if unique_flag:
-                    self.unique_bug.append(self.chrom2string(chrom))
+            _COLLISIONS.inc(kind='npc')
+            for operator in operators:
+                _OPERATOR_COLLISIONS.inc(operator=operator)
+            # unique unless its quick_ratio with a known bug exceeds 0.8
+            if self.bug_index.add_if_unique(scenario):
+                self.unique_bug.append(scenario)
+                _UNIQUE_BUGS.set(len(self.unique_bug))
+                for operator in operators:
+                    _OPERATOR_UNIQUE_BUGS.inc(operator=operator)
 
         # collision with boundary
         if not is_avfuzzer:
             if chrom.fitness[-2] < 0.89:
                 self.collision_with_boundary_count += 1
+                _COLLISIONS.inc(kind='boundary')
 
         # record these metrics
-        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../results",
-                               "metric_{}.txt".format(self.start_time)), 'a') as f:
-            f.write(str(self.collision_with_npc_count) + ' ' + str(self.collision_with_boundary_count) +
-                    ' ' + str(len(self.unique_bug)) + '\n')
+        self.get_result_sink().put("metric_{}.jsonl".format(self.start_time), {
+            'collision_with_npc': self.collision_with_npc_count,
+            'collision_with_boundary': self.collision_with_boundary_count,
+            'unique_bug': len(self.unique_bug)
+        })
 
         # record each evaluation
-        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../results",
-                               "result_{}.txt".format(self.start_time)), 'a') as f:
-
-            info_dict = {
-                'fitness': chrom.fitness,
-                'scenario': self.chrom2string(chrom)
-            }
-            f.write(str(info_dict) + '\r\n')
+        if self.archive is not None:
+            self.archive.append(chrom, self.iteration, 'avfuzzer' if is_avfuzzer else 'ga')
+        self.get_result_sink().put("result_{}.jsonl".format(self.start_time), {
+            'fitness': chrom.fitness,
+            'scenario': scenario
+        })
+        _RESULT_QUEUE.set(self.get_result_sink().depth)
 
     def get_survivals(self, population: None | list = None, n_survival: int = config.ga_config.population):
         pop: list[TestCaseChromosome] = self.population if population is None else population
@@ -258,40 +698,195 @@ class SearchAlgorithm:
         self.logger.info("Survivors: %s", str(survivors))
         return [pop[i] for i in survivors]
 
+    def insert_survivor(self, offspring: TestCaseChromosome, n_survival: int = config.ga_config.population):
+        """Insert offspring into the fronts of the ranked population, then drop the most crowded of its last front.
+
+        Only the fronts from the rank of offspring down are touched: the individuals offspring dominates
+        in its front drop to the next one, those they dominate there drop further, and so on.
+        """
+        fronts: list[list[TestCaseChromosome]] = []
+        for chrom in self.population:
+            fronts.extend([] for _ in range(chrom.rank + 1 - len(fronts)))
+            fronts[chrom.rank].append(chrom)
+        fronts = [front for front in fronts if front]
+        fitness = np.array([offspring.fitness], dtype=float)
+        rank = 0
+        while rank < len(fronts) and fnds.dominated_by_any(
+                fitness, np.array([chrom.fitness for chrom in fronts[rank]], dtype=float))[0]:
+            rank += 1
+
+        changed = []
+        moving = [offspring]
+        while moving:
+            changed.append(rank)
+            if rank == len(fronts):
+                fronts.append(moving)
+                break
+            front = fronts[rank]
+            dominated = fnds.dominated_by_any(np.array([chrom.fitness for chrom in front], dtype=float),
+                                              np.array([chrom.fitness for chrom in moving], dtype=float))
+            fronts[rank] = [chrom for chrom, drops in zip(front, dominated) if not drops] + moving
+            moving = [chrom for chrom, drops in zip(front, dominated) if drops]
+            rank += 1
+
+        while sum(len(front) for front in fronts) > n_survival:
+            last = fronts[-1]
+            crowding = fnds.calc_crowding_distance(np.array([chrom.fitness for chrom in last], dtype=float))
+            # ties are broken at random, like the truncation of get_survivals
+            P = np.random.permutation(len(last))
+            del last[P[np.argmin(crowding[P])]]
+            if not last:
+                fronts.pop()
+            changed.append(len(fronts) - 1)
+
+        for k in set(changed):
+            if k >= len(fronts):
+                continue
+            crowding = fnds.calc_crowding_distance(np.array([chrom.fitness for chrom in fronts[k]], dtype=float))
+            for chrom, distance in zip(fronts[k], crowding):
+                chrom.rank = k
+                chrom.crowding = distance
+        self.population = [chrom for front in fronts for chrom in front]
+
     def evolve(self):
-        new_generation = []
+        with tracer.TRACER.span('generation', iteration=self.iteration):
+            new_generation = []
 
-        while len(new_generation) < config.ga_config.population:
+            while len(new_generation) < config.ga_config.population:
+                with tracer.TRACER.span('variation'):
+                    new_generation.extend(self.reproduce())
+
+            self.eval_population(new_generation)
+            population = self.population + new_generation
+
+            with profiler.TIMER.phase('survival'), tracer.TRACER.span('survival'):
+                self.population = self.get_survivals(population, n_survival=config.ga_config.population)
+        self.logger.info("The best individual: %s \r\n its fitness score is %s",
+                         LazySource(self.population[0]), str(self.population[0].fitness))
+
+    def reproduce(self) -> list[TestCaseChromosome]:
+        with profiler.TIMER.phase('selection'):
             parent_1 = self.selection.select(self.population, 2)[0]
             parent_2 = self.selection.select(self.population, 2)[0]
+        with profiler.TIMER.phase('clone'):
             offspring_1 = parent_1.clone()
             offspring_2 = parent_2.clone()
 
-            self.logger.info("parent 1: %s", self.chrom2string(parent_1))
-            self.logger.info("parent 2: %s", self.chrom2string(parent_2))
+        self.logger.info("parent 1: %s", LazySource(parent_1), extra={'category': 'parent'})
+        self.logger.info("parent 2: %s", LazySource(parent_2), extra={'category': 'parent'})
 
-            if randomness.next_float() <= config.ga_config.crossover_rate:
+        if randomness.next_float() <= config.ga_config.crossover_rate:
+            with profiler.TIMER.phase('crossover'):
                 self.crossover.crossover(offspring_1, offspring_2)
 
-            self.logger.info("offspring 1 after crossover: %s", self.chrom2string(offspring_1))
-            self.logger.info("offspring 2 after crossover: %s", self.chrom2string(offspring_2))
+        self.logger.info("offspring 1 after crossover: %s", LazySource(offspring_1), extra={'category': 'offspring'})
+        self.logger.info("offspring 2 after crossover: %s", LazySource(offspring_2), extra={'category': 'offspring'})
 
+        with profiler.TIMER.phase('mutation'):
             offspring_1.mutate()
             offspring_2.mutate()
 
-            self.logger.info("offspring 1 after mutation: %s", self.chrom2string(offspring_1))
-            self.logger.info("offspring 2 after mutation: %s", self.chrom2string(offspring_2))
-
-            new_generation.append(offspring_1)
-            new_generation.append(offspring_2)
-
-        self.eval_population(new_generation)
-        population = self.population + new_generation
+        self.logger.info("offspring 1 after mutation: %s", LazySource(offspring_1), extra={'category': 'offspring'})
+        self.logger.info("offspring 2 after mutation: %s", LazySource(offspring_2), extra={'category': 'offspring'})
+
+        return [offspring_1, offspring_2]
+
+    def steady_state_generate_tests(self, resume: str | None = None):
+        """Evolve without a generation barrier.
+
+        A new pair of offspring is bred as soon as evaluation slots free up, and every finished
+        individual is inserted into the fronts of the population by insert_survivor, which then drops one.
+        The run stops after the same number of evaluations as the generational search, and unlike
+        it never restarts the population when the number of unique bugs stagnates.
+        Simulations run like in simulate_population: in eval_workers processes, max_in_flight
+        sim_async calls on the event loop, or a slot-full at a time through sim_batch.
+        Checkpoints are written every population-size evaluations, the simulations still in
+        flight at that point are not part of them and are bred anew on resume.
+        """
+        self.budget.start()
+        if resume is not None:
+            self.load_checkpoint(resume, 'steady_state')
+        elif not self.start_population():
+            self.shutdown()
+            return None
+
+        budget = config.ga_config.iteration * config.ga_config.population
+        slots = config.ga_config.eval_workers if config.ga_config.eval_workers > 1 else \
+            max(1, config.ga_config.max_in_flight)
+        evaluated = self.iteration * config.ga_config.population
+        simulations = 0
+        generation_start = time.perf_counter()
+        in_flight: dict[asyncio.Future, tuple[TestCaseChromosome, str]] = {}
+        finished: list[tuple[TestCaseChromosome, list]] = []
+
+        while evaluated < budget and not self.budget_exhausted():
+            while len(in_flight) + len(finished) < slots and evaluated + len(in_flight) + len(finished) < budget:
+                for offspring in self.reproduce():
+                    with profiler.TIMER.phase('fitness_lookup'):
+                        key = offspring.canonical_hash()
+                        fitness = self.lookup_fitness([key])[0]
+                    if fitness is None:
+                        self.logger.info("evaluate individual: %s", LazySource(offspring),
+                                         extra={'category': 'evaluation'})
+                        in_flight[self.submit_simulation(offspring)] = (offspring, key)
+                    else:
+                        _EVALUATIONS.inc(mode='ga', source='known')
+                        finished.append((offspring, fitness))
+
+            if not finished:
+                _SIMULATION_QUEUE.set(len(in_flight))
+                with profiler.TIMER.phase('simulation'):
+                    done = self.wait_simulations(in_flight)
+                for future in done:
+                    offspring, key = in_flight.pop(future)
+                    fitness, seconds = _unpack_simulation(future.result())
+                    self.budget.count()
+                    profiler.TIMER.count('simulations')
+                    _SIMULATION_SECONDS.observe(seconds)
+                    _EVALUATIONS.inc(mode='ga', source='simulation')
+                    simulations += 1
+                    self.store_fitness(key, fitness)
+                    finished.append((offspring, fitness))
+
+            for offspring, fitness in finished:
+                if self.budget.exhausted(len(self.unique_bug)):
+                    break
+                offspring.fitness = fitness
+                self.logger.info("its fitness score is: %s", str(offspring.fitness))
+                with profiler.TIMER.phase('record_metric'):
+                    self.record_metric(offspring)
+                with profiler.TIMER.phase('survival'):
+                    self.insert_survivor(offspring)
+                evaluated += 1
+                if evaluated % config.ga_config.population == 0:
+                    self.history.append(self.chrom2string(self.population[0]))
+                    self.unique_bug_count.append(len(self.unique_bug))
+                    self.iteration += 1
+                    self.update_rates(simulations, time.perf_counter() - generation_start)
+                    simulations = 0
+                    generation_start = time.perf_counter()
+                    self.end_steady_state_generation()
+                    with profiler.TIMER.phase('checkpoint'):
+                        self.checkpoint('steady_state')
+                    profiler.TIMER.end_generation(self.iteration)
+            finished.clear()
+
+        # a pair may overshoot the budget by one individual, the search budget leaves up to a slot-full behind
+        self.cancel_simulations(in_flight)
+        self.checkpoint('steady_state', finished=True)
+        self.report_phases()
+        self.shutdown()
+        return self.population[0]
 
-        self.population = self.get_survivals(population, n_survival=config.ga_config.population)
-        self.logger.info("The best individual: %s \r\n its fitness score is %s",
-                         self.chrom2string(self.population[0]), str(self.population[0].fitness))
+    def end_steady_state_generation(self):
+        """Called by the steady-state search after every population-size evaluations"""
 
+    def report_phases(self):
+        if not profiler.TIMER.enabled:
+            return
+        self.logger.info("time per phase:\n%s", profiler.TIMER.summary())
+        profiler.TIMER.dump(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../results",
+                                         "phases_{}.json".format(self.start_time)))
 
     def elitism(self):
         elite = []
@@ -301,18 +896,15 @@ class SearchAlgorithm:
 
     @staticmethod
     def chrom2string(chrom: TestCaseChromosome):
-        return ast.unparse(ast.fix_missing_locations(chrom.ast_node()))
+        return chrom.to_source()
 
     def record(self):
         # record each generation
-        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../results",
-                               "result_{}.txt".format(self.start_time)), 'a') as f:
-            for individual in self.population:
-                info_dict = {
-                    'fitness': individual.fitness,
-                    'scenario': self.chrom2string(individual)
-                }
-                f.write(str(info_dict) + '\r\n')
+        for individual in self.population:
+            self.get_result_sink().put("result_{}.jsonl".format(self.start_time), {
+                'fitness': individual.fitness,
+                'scenario': self.chrom2string(individual)
+            })
 
 
 if __name__ == '__main__':
@@ -0,0 +1,245 @@
+"""Append-only archive of every evaluated scenario.
+
+An archive is a directory of
+
+    manifest.json           layout and the number of committed rows
+    genome_<n>.npy          float32 (segment_rows, max_statements, GENOME_COLUMNS), NaN padded
+    fitness_<n>.npy         float64 (segment_rows, fitness_width), NaN padded
+    index_<n>.npy           INDEX_DTYPE (segment_rows,), where the row's test case is in blobs.bin
+    blobs.bin               the test cases in the binary form of core.codec, back to back
+
+Segments are preallocated .npy files, so numpy.load(..., mmap_mode='r') opens them as they are. A
+genome row has one line per statement: opcode, entity kind, entity number and up to five argument
+values, which is lossy for float64 arguments and cut at max_statements; the blob is the exact test
+case. Rows are only ever appended, and become visible to readers when the manifest is replaced by
+flush, after the segments and the blob file are synced.
+"""
+from __future__ import annotations
+import json
+import logging
+import mmap
+import os
+import time
+from typing import TYPE_CHECKING, Iterator, NamedTuple
+import numpy as np
+from core.codec import decode_test_case, encode_test_case, statement_fields
+from core.chromosome import TestCaseChromosome
+if TYPE_CHECKING:
+    from core.factory import TestFactory
+    from core.parse_module import TestCluster
+    from core.testcase import TestCase
+
+ARCHIVE_VERSION = 1
+
+# opcode, entity kind, entity number and the arguments of the longest signature (Road)
+GENOME_COLUMNS = 8
+
+INDEX_DTYPE = np.dtype([
+    ('offset', '<u8'),
+    ('length', '<u4'),
+    ('statements', '<u2'),
+    ('mode', 'u1'),
+    ('iteration', '<u4'),
+    ('timestamp', '<f8'),
+])
+
+MODES = ('ga', 'avfuzzer')
+
+
+class ArchiveSegment(NamedTuple):
+    genome: np.ndarray
+    fitness: np.ndarray
+    index: np.ndarray
+
+
+def genome_rows(test_case: TestCase, max_statements: int) -> np.ndarray:
+    rows = np.full((max_statements, GENOME_COLUMNS), np.nan, dtype=np.float32)
+    for row, statement in zip(rows, test_case.statements):
+        opcode, kind, number, values = statement_fields(statement)
+        row[:3 + len(values)] = (opcode, kind, number, *values)
+    return rows
+
+
+class ScenarioArchive:
+    """Memory-mapped, append-only store of evaluated scenarios.
+
+    Opened read-only, segment(i) returns zero-copy views of the committed rows of a segment, and a
+    running campaign can be read while it writes. Opened writable, uncommitted rows of an earlier
+    process that did not flush are overwritten.
+    """
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, directory: str, writable: bool = False, segment_rows: int = 65536,
+                 max_statements: int = 30, fitness_width: int = 4, flush_size: int = 256):
+        self._directory = directory
+        self._writable = writable
+        self._flush_size = flush_size
+        self._segments: dict[int, ArchiveSegment] = {}
+        self._blob_map: mmap.mmap | None = None
+
+        manifest_path = os.path.join(directory, 'manifest.json')
+        if os.path.exists(manifest_path):
+            manifest = self._read_manifest()
+        elif writable:
+            os.makedirs(directory, exist_ok=True)
+            manifest = {'version': ARCHIVE_VERSION, 'segment_rows': segment_rows, 'max_statements': max_statements,
+                        'fitness_width': fitness_width, 'rows': 0, 'blob_size': 0}
+        else:
+            raise FileNotFoundError("no scenario archive in {}".format(directory))
+
+        # the layout of an existing archive wins over the arguments
+        self.segment_rows = manifest['segment_rows']
+        self.max_statements = manifest['max_statements']
+        self.fitness_width = manifest['fitness_width']
+        self._rows = manifest['rows']
+        self._blob_size = manifest['blob_size']
+
+        self._blob = None
+        if writable:
+            self._end = self._rows
+            self._blob = open(os.path.join(directory, 'blobs.bin'), 'ab+')
+            self._blob.truncate(self._blob_size)
+            self._blob.seek(self._blob_size)
+            self._write_manifest()
+
+    def _read_manifest(self) -> dict:
+        with open(os.path.join(self._directory, 'manifest.json')) as f:
+            manifest = json.load(f)
+        if manifest['version'] != ARCHIVE_VERSION:
+            raise ValueError("unsupported archive version {}".format(manifest['version']))
+        return manifest
+
+    def refresh(self):
+        """Pick up the rows committed by the writer since the archive was opened"""
+        if not self._writable:
+            self._rows = self._read_manifest()['rows']
+
+    @property
+    def directory(self):
+        return self._directory
+
+    def __len__(self):
+        return self._rows
+
+    @property
+    def segment_count(self) -> int:
+        return -(-self._rows // self.segment_rows)
+
+    def _path(self, name: str, segment: int) -> str:
+        return os.path.join(self._directory, '{}_{:05d}.npy'.format(name, segment))
+
+    def _open_segment(self, segment: int) -> ArchiveSegment:
+        if segment not in self._segments:
+            paths = [self._path(name, segment) for name in ArchiveSegment._fields]
+            if self._writable and not os.path.exists(paths[0]):
+                shapes = [(self.segment_rows, self.max_statements, GENOME_COLUMNS),
+                          (self.segment_rows, self.fitness_width), (self.segment_rows,)]
+                dtypes = [np.float32, np.float64, INDEX_DTYPE]
+                arrays = [np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=shape)
+                          for path, dtype, shape in zip(paths, dtypes, shapes)]
+            else:
+                arrays = [np.load(path, mmap_mode='r+' if self._writable else 'r') for path in paths]
+            self._segments[segment] = ArchiveSegment(*arrays)
+        return self._segments[segment]
+
+    def segment(self, segment: int) -> ArchiveSegment:
+        """Views of the committed rows of a segment, nothing is copied"""
+        rows = min(self.segment_rows, self._rows - segment * self.segment_rows)
+        if segment < 0 or rows <= 0:
+            raise IndexError("segment {} out of range".format(segment))
+        arrays = self._open_segment(segment)
+        return ArchiveSegment(*(array[:rows] for array in arrays))
+
+    def iter_segments(self) -> Iterator[ArchiveSegment]:
+        for segment in range(self.segment_count):
+            yield self.segment(segment)
+
+    def column(self, name: str) -> np.ndarray:
+        """One of genome, fitness or index over the whole archive, a copy unless there is a single segment"""
+        parts = [getattr(segment, name) for segment in self.iter_segments()]
+        if len(parts) == 1:
+            return parts[0]
+        return np.concatenate(parts) if parts else getattr(self._empty_segment(), name)
+
+    def _empty_segment(self) -> ArchiveSegment:
+        return ArchiveSegment(np.empty((0, self.max_statements, GENOME_COLUMNS), dtype=np.float32),
+                              np.empty((0, self.fitness_width)), np.empty(0, dtype=INDEX_DTYPE))
+
+    def blob(self, row: int) -> bytes:
+        if not 0 <= row < self._rows:
+            raise IndexError("row {} out of range".format(row))
+        entry = self._open_segment(row // self.segment_rows).index[row % self.segment_rows]
+        end = int(entry['offset']) + int(entry['length'])
+        if self._blob_map is None or len(self._blob_map) < end:
+            # the blob file grew since it was mapped
+            if self._blob_map is not None:
+                self._blob_map.close()
+            with open(os.path.join(self._directory, 'blobs.bin'), 'rb') as f:
+                self._blob_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._blob_map[int(entry['offset']): end]
+
+    def test_case(self, row: int, test_cluster: TestCluster) -> TestCase:
+        return decode_test_case(self.blob(row), test_cluster)
+
+    def chromosomes(self, test_factory: TestFactory) -> Iterator[TestCaseChromosome]:
+        """Rebuild the evaluated chromosomes in the order they were archived, with their fitness"""
+        for number, segment in enumerate(self.iter_segments()):
+            for row, fitness in enumerate(segment.fitness):
+                chrom = TestCaseChromosome(
+                    self.test_case(number * self.segment_rows + row, test_factory.test_cluster), test_factory)
+                chrom.fitness = fitness[~np.isnan(fitness)].tolist()
+                yield chrom
+
+    def append(self, chrom: TestCaseChromosome, iteration: int = 0, mode: str = 'ga'):
+        if not self._writable:
+            raise ValueError("the archive in {} is read-only".format(self._directory))
+        segment, row = divmod(self._end, self.segment_rows)
+        genome, fitness, index = self._open_segment(segment)
+        data = encode_test_case(chrom.test_case)
+
+        genome[row] = genome_rows(chrom.test_case, self.max_statements)
+        values = np.atleast_1d(np.asarray(chrom.fitness, dtype=np.float64))[:self.fitness_width]
+        fitness[row] = np.nan
+        fitness[row, :len(values)] = values
+        index[row] = (self._blob.tell(), len(data), chrom.test_case.size(), MODES.index(mode), iteration, time.time())
+        self._blob.write(data)
+        self._end += 1
+        if self._end - self._rows >= self._flush_size:
+            self.flush()
+
+    def flush(self):
+        """Commit the appended rows, readers see them once the manifest is replaced"""
+        if not self._writable or self._end == self._rows:
+            return
+        for segment in range(self._rows // self.segment_rows, (self._end - 1) // self.segment_rows + 1):
+            for array in self._segments[segment]:
+                array.flush()
+        self._blob.flush()
+        os.fsync(self._blob.fileno())
+        self._rows = self._end
+        self._blob_size = self._blob.tell()
+        self._write_manifest()
+        # segments before the one being written are complete, drop their mappings
+        for segment in [segment for segment in self._segments if segment < self._end // self.segment_rows]:
+            del self._segments[segment]
+
+    def _write_manifest(self):
+        path = os.path.join(self._directory, 'manifest.json')
+        with open(path + '.tmp', 'w') as f:
+            json.dump({'version': ARCHIVE_VERSION, 'segment_rows': self.segment_rows,
+                       'max_statements': self.max_statements, 'fitness_width': self.fitness_width,
+                       'rows': self._rows, 'blob_size': self._blob_size}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + '.tmp', path)
+
+    def close(self):
+        self.flush()
+        if self._blob is not None:
+            self._blob.close()
+            self._blob = None
+        if self._blob_map is not None:
+            self._blob_map.close()
+            self._blob_map = None
+        self._segments.clear()
+        self._writable = False
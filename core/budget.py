@@ -0,0 +1,39 @@
+from __future__ import annotations
+import time
+
+
+class SearchBudget:
+    """Limits of a search run, a limit of 0 is unlimited.
+
+    max_evaluations counts simulator runs, fitness values taken from the cache or the store are free.
+    max_wall_time is measured in seconds from start, which the search calls when it begins.
+    """
+
+    def __init__(self, max_evaluations: int = 0, max_wall_time: float = 0, target_unique_bugs: int = 0):
+        self.max_evaluations = max_evaluations
+        self.max_wall_time = max_wall_time
+        self.target_unique_bugs = target_unique_bugs
+        self.evaluations = 0
+        self._start = time.monotonic()
+
+    def start(self):
+        self._start = time.monotonic()
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self._start
+
+    def count(self, evaluations: int = 1):
+        self.evaluations += evaluations
+
+    def exhaustion_reason(self, unique_bugs: int) -> str | None:
+        if 0 < self.max_evaluations <= self.evaluations:
+            return "{} evaluations".format(self.evaluations)
+        if 0 < self.max_wall_time <= self.elapsed:
+            return "{:.1f} seconds".format(self.elapsed)
+        if 0 < self.target_unique_bugs <= unique_bugs:
+            return "{} unique bugs".format(unique_bugs)
+        return None
+
+    def exhausted(self, unique_bugs: int) -> bool:
+        return self.exhaustion_reason(unique_bugs) is not None
@@ -0,0 +1,54 @@
+from __future__ import annotations
+from collections import OrderedDict
+
+
+class FitnessCache:
+    """LRU map from a canonical test case hash to the fitness the simulator returned for it."""
+
+    def __init__(self, max_size: int):
+        self._max_size = max_size
+        self._entries: OrderedDict[str, list] = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def max_size(self):
+        return self._max_size
+
+    @property
+    def hits(self):
+        return self._hits
+
+    @property
+    def misses(self):
+        return self._misses
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key: str):
+        return key in self._entries
+
+    def items(self) -> list[tuple[str, list]]:
+        return list(self._entries.items())
+
+    def update(self, items: list[tuple[str, list]]):
+        for key, fitness in items:
+            self.put(key, fitness)
+
+    def get(self, key: str) -> list | None:
+        fitness = self._entries.get(key)
+        if fitness is None:
+            self._misses += 1
+            return None
+        self._hits += 1
+        self._entries.move_to_end(key)
+        return fitness
+
+    def put(self, key: str, fitness: list):
+        if self._max_size <= 0:
+            return
+        self._entries[key] = fitness
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
@@ -0,0 +1,32 @@
+from __future__ import annotations
+import gzip
+import os
+import pickle
+
+CHECKPOINT_VERSION = 3
+
+
+def write_checkpoint(path: str, state: dict):
+    """Write the search state atomically, a crash mid-write leaves the previous checkpoint intact"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = '{}.tmp'.format(path)
+    with open(tmp_path, 'wb') as f:
+        with gzip.GzipFile(fileobj=f, mode='wb') as compressed:
+            pickle.dump({'version': CHECKPOINT_VERSION, **state}, compressed, protocol=pickle.HIGHEST_PROTOCOL)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def is_resumable(path: str | None) -> bool:
+    """Whether path holds the checkpoint of a run that was interrupted, a finished run marks its own"""
+    return path is not None and os.path.exists(path) and not read_checkpoint(path).get('finished', False)
+
+
+def read_checkpoint(path: str) -> dict:
+    with gzip.open(path, 'rb') as f:
+        state = pickle.load(f)
+    if state.get('version') != CHECKPOINT_VERSION:
+        raise ValueError("unsupported checkpoint version {} in {}".format(state.get('version'), path))
+    return state
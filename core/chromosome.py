@@ -2,7 +2,6 @@ from __future__ import annotations
 from typing import TYPE_CHECKING
 import ast
 import logging
-import re
 import numpy as np
 if TYPE_CHECKING:
     import core.testcase as tc
@@ -12,6 +11,10 @@ import core.statement as stmt
 from configuration import configuration as config
 from abc import ABCMeta, abstractmethod
 
+# the composition of a scenario returned by TestCaseChromosome.features
+FEATURES = ('objects', 'actions', 'action_types', 'roads', 'npcs', 'vehicles', 'complexity')
+
+
 class TestCaseChromosome:
     logger = logging.getLogger(__name__)
 
@@ -25,16 +28,24 @@ class TestCaseChromosome:
             self._test_case = test_case
             self._test_factory = test_factory
             self._fitness = []
-            self._complexity = self.calc_complexity()
             self._rank = None
             self._crowding = None
+            self._version = 0
+            self._source = None
+            self._hash = None
+            self._operators = ('random',)
         else:
             self._test_case = orig._test_case.clone()
             self._test_factory = orig._test_factory
             self._fitness = orig._fitness
-            self._complexity = orig._complexity
             self._rank = orig._rank
             self._crowding = orig._crowding
+            self._version = orig._version
+            # the clone renders like the original until one of them changes
+            self._source = (self.version, orig._source[1]) if orig.memo_valid(orig._source) else None
+            self._hash = (self.version, orig._hash[1]) if orig.memo_valid(orig._hash) else None
+            # the variation operators applied to the clone, for the yield of each operator
+            self._operators = ()
 
     @property
     def test_case(self):
@@ -50,7 +61,7 @@ class TestCaseChromosome:
 
     @property
     def complexity(self):
-        return self._complexity
+        return self.calc_complexity()
 
     @property
     def rank(self):
@@ -60,6 +71,19 @@ class TestCaseChromosome:
     def crowding(self):
         return self._crowding
 
+    @property
+    def operators(self) -> tuple[str, ...]:
+        """Operators that made this individual, ('clone',) for an unchanged copy"""
+        return self._operators or ('clone',)
+
+    @property
+    def version(self) -> tuple[int, int]:
+        return self._version, self._test_case.version
+
+    @test_factory.setter
+    def test_factory(self, test_factory):
+        self._test_factory = test_factory
+
     @fitness.setter
     def fitness(self, fitness):
         self._fitness = fitness
@@ -72,44 +96,69 @@ class TestCaseChromosome:
     def crowding(self, crowding):
         self._crowding = crowding
 
+    def __getstate__(self):
+        # the factory is only needed for variation, so it is not shipped to evaluation workers
+        state = self.__dict__.copy()
+        state['_test_factory'] = None
+        return state
+
     def size(self):
         return self._test_case.size()
 
     def ast_node(self):
         return ast.fix_missing_locations(self._test_case.test_case_to_ast())
 
+    def invalidate(self):
+        """Mark the memoized source and hash stale, needed after changing statements in place"""
+        self._version += 1
+
+    def memo_valid(self, memo: tuple | None) -> bool:
+        return memo is not None and memo[0] == self.version
+
+    def to_source(self) -> str:
+        if not self.memo_valid(self._source):
+            self._source = (self.version, ast.unparse(self.ast_node()))
+        return self._source[1]
+
+    def canonical_hash(self) -> str:
+        if not self.memo_valid(self._hash):
+            self._hash = (self.version, self._test_case.canonical_hash())
+        return self._hash[1]
+
     def clone(self):
         return TestCaseChromosome(orig=self)
 
     def calc_complexity(self):
-        objects_num = 0
-        action_type = []
-        for statement in self._test_case.statements:
-            if isinstance(statement, stmt.ConstructorStatement):
-                objects_num += 1
-            else:
-                action_type.append(statement.callee)
-        action_length = len(self._test_case.statements) - objects_num
-        action_type = len(set(action_type))
+        # read from the counts the test case keeps up to date, no statement is visited
+        objects_num = self._test_case.object_size()
+        action_length = self._test_case.size() - objects_num
+        action_type = self._test_case.action_type_size()
         return action_length / 10 + 2 * objects_num / 5 + action_type / 3
 
+    def vehicle_size(self) -> int:
+        """Number of NPC constructors, the Ego's included"""
+        return len(self._test_case.vehicles)
+
+    def features(self) -> np.ndarray:
+        """The composition of the scenario, in the order of FEATURES"""
+        objects_num = self._test_case.object_size()
+        return np.array([objects_num, self._test_case.size() - objects_num, self._test_case.action_type_size(),
+                         self._test_case.road_size(), self._test_case.npc_size(), self.vehicle_size(),
+                         self.calc_complexity()], dtype=np.float64)
+
     def avfuzzer_crossover(self, other: TestCaseChromosome, npc_index: int):
         offspring = self._test_case.clone(0, self._test_case.size())
-        other_methods = []
-        for st in other._test_case.statements:
-            if isinstance(st, stmt.MethodStatement) and st.callee == 'npc{}'.format(npc_index):
-                other_methods.append(st.clone(offspring))
+        other_methods = [st.clone(offspring) for st in other._test_case.methods('npc{}'.format(npc_index))]
 
-        for i in reversed(range(len(offspring.statements))):
-            if isinstance(offspring.statements[i], stmt.MethodStatement) and offspring.statements[i].callee == 'npc{}'.format(npc_index):
-                offspring.delete_method_statement(offspring.statements[i])
+        for method in reversed(offspring.methods('npc{}'.format(npc_index))):
+            offspring.delete_method_statement(method)
 
         for method in other_methods:
             offspring.add_statement(method, offspring.size())
 
         self._test_case = offspring
-        for st in self._test_case.statements:
-            st.stmt_to_ast()
+        self._operators += ('avfuzzer_crossover',)
+        self.invalidate()
 
     def avfuzzer_mutation(self):
         mutate_position = randomness.next_int(5, 15)
@@ -120,7 +169,9 @@ class TestCaseChromosome:
             self._test_case.delete_method_statement(statement)
             self._test_factory.insert_random_npc_method(self._test_case, mutate_position, callee)
         else:
-            statement.avfuzzer_mutate()
+            self._test_case.writable(statement).avfuzzer_mutate()
+        self._operators += ('avfuzzer_mutation',)
+        self.invalidate()
 
     def crossover(self, other: TestCaseChromosome, road_position: int, npc_positions: list):
         offspring = self._test_case.clone(0, self._test_case.size())
@@ -128,10 +179,9 @@ class TestCaseChromosome:
         if road_position != 0:
             road = self._test_case.road_constructors[road_position]
             other_road = other._test_case.road_constructors[road_position].clone(offspring)
-            other_road_method = None
-            for st in other._test_case.road_statements:
-                if isinstance(st, stmt.MethodStatement) and st.callee == other_road.assignee:
-                    other_road_method = st.clone(offspring)
+            other_road_method = other._test_case.shape_change(other_road.assignee)
+            if other_road_method is not None:
+                other_road_method = other_road_method.clone(offspring)
 
             offspring.delete_road(offspring.road_constructors[road_position])
 
@@ -139,10 +189,7 @@ class TestCaseChromosome:
             if other_road_method is not None:
                 offspring.add_statement(other_road_method, global_position + 1)
 
-            npc_num = 0
-            for st in offspring.statements:
-                if isinstance(st, stmt.ConstructorStatement) and re.match('npc', st.assignee) is not None:
-                    npc_num += 1
+            npc_num = offspring.npc_size()
 
             npc_to_delete = []
             for i in reversed(range(len(offspring.road_statements) + 1, len(offspring.road_statements) + 1 + npc_num)):
@@ -153,22 +200,16 @@ class TestCaseChromosome:
             for npc in npc_to_delete:
                 offspring.delete_constructor_statement(npc)
 
-            current_npc_num = 0
-            for st in offspring.statements:
-                if isinstance(st, stmt.ConstructorStatement) and re.match('npc', st.assignee) is not None:
-                    current_npc_num += 1
-                    for method in offspring.statements:
-                        if isinstance(method, stmt.MethodStatement) and method.callee == st.assignee:
-                            method.callee = 'npc{}'.format(current_npc_num)
-                    st.assignee = 'npc{}'.format(current_npc_num)
+            for current_npc_num, npc in enumerate(offspring.get_callees(), 1):
+                offspring.rename_entity(npc, 'npc{}'.format(current_npc_num))
 
             npc_from_other_road = []
             npc_method_from_other_road = []
             # find the npcs and methods on other_road
-            for st in other._test_case.statements:
-                if isinstance(st, stmt.ConstructorStatement) and st.class_name == 'NPC' and st.args['road_id'] == road_position:
-                    for method in other._test_case.statements:
-                        if isinstance(method, stmt.MethodStatement) and method.class_name == 'NPC' and method.callee == st.assignee:
+            for st in other._test_case.vehicles:
+                if st.args['road_id'] == road_position:
+                    for method in other._test_case.methods(st.assignee):
+                        if method.class_name == 'NPC':
                             method = method.clone(offspring)
                             method.callee = st.assignee + '_other'
                             npc_method_from_other_road.append(method)
@@ -177,10 +218,7 @@ class TestCaseChromosome:
                     npc.assignee = npc.assignee + '_other'
                     npc_from_other_road.append(npc)
             # rename them and add to offspring
-            npc_num = 0
-            for st in offspring.statements:
-                if isinstance(st, stmt.ConstructorStatement) and re.match('npc', st.assignee) is not None:
-                    npc_num += 1
+            npc_num = offspring.npc_size()
             start_name = npc_num + 1
             # rename back those npc on other_road
             for npc in npc_from_other_road:
@@ -196,51 +234,44 @@ class TestCaseChromosome:
                 offspring.add_statement(method, offspring.size())
 
         # npc part
-        vehicle_num1 = 0
-        vehicle_num2 = 0
-        for statement in offspring.statements:
-            if isinstance(statement, stmt.ConstructorStatement) and statement.class_name == 'NPC':
-                vehicle_num1 += 1
-        for statement in other.test_case.statements:
-            if isinstance(statement, stmt.ConstructorStatement) and statement.class_name == 'NPC':
-                vehicle_num2 += 1
+        vehicle_num1 = len(offspring.vehicles)
+        vehicle_num2 = other.vehicle_size()
         npc_position = randomness.next_int(1, min(vehicle_num1, vehicle_num2))
         self.logger.info("exchange maneuvers on npc%d", npc_position)
 
-        other_methods = []
-        for st in other._test_case.statements:
-            if isinstance(st, stmt.MethodStatement) and st.callee == 'npc{}'.format(npc_position):
-                other_methods.append(st.clone(offspring))
+        other_methods = [st.clone(offspring) for st in other._test_case.methods('npc{}'.format(npc_position))]
 
-        for i in reversed(range(len(offspring.statements))):
-            if isinstance(offspring.statements[i], stmt.MethodStatement) and offspring.statements[i].callee == 'npc{}'.format(npc_position):
-                offspring.delete_method_statement(offspring.statements[i])
+        for method in reversed(offspring.methods('npc{}'.format(npc_position))):
+            offspring.delete_method_statement(method)
         for method in other_methods:
             offspring.add_statement(method, offspring.size())
 
         self._test_case = offspring
-        for st in self._test_case.statements:
-            st.stmt_to_ast()
+        self._operators += ('crossover',)
+        self.invalidate()
 
     def mutate(self):
         self.logger.info("start mutate")
         if randomness.next_float() <= config.ga_config.test_insert_probability:
             self.logger.info("enter mutation_insert")
             self.mutation_insert()
+            self._operators += ('mutation_insert',)
         if randomness.next_float() <= config.ga_config.test_change_probability:
             self.logger.info("enter mutation_change")
             self.mutation_change()
+            self._operators += ('mutation_change',)
         if randomness.next_float() <= config.ga_config.test_delete_probability:
             self.logger.info("enter mutation_delete")
             self.mutation_delete()
+            self._operators += ('mutation_delete',)
 
-        self._complexity = self.calc_complexity()
+        self.invalidate()
 
     def mutation_insert(self):
         # road part
         if self.test_case.road_size() < config.ga_config.max_road_num:
             insert_position = randomness.next_int(0, self.test_case.road_size() + 1)
-            print(insert_position)
+            self.logger.debug("insert road at position %d", insert_position)
             self._test_factory.mutation_insert_road(self._test_case, insert_position)
 
         # npc part
@@ -257,7 +288,7 @@ class TestCaseChromosome:
         position = len(self._test_case.road_statements) + 1  # from npc1
         while position < self._test_case.size():
             if randomness.next_float() < prob_change:
-                statement = self._test_case.get_statement(position)
+                statement = self._test_case.writable(self._test_case.get_statement(position))
                 self.logger.info("npc part, change mutation at position: %d", position)
                 statement.mutate()
             position += 1
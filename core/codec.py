@@ -0,0 +1,148 @@
+"""Compact binary form of test cases and chromosomes.
+
+A chromosome is encoded as
+
+    header      magic b'ADVS', format version (uint8), statement count (uint16)
+    rank        int32, -1 if unranked
+    crowding    float64, NaN if not computed
+    fitness     kind (uint8: 0 none, 1 vector, 2 scalar) followed by a value block
+    statements  one per statement: opcode (uint8), entity kind (uint8), entity number (uint16), value block
+
+and a value block is a count (uint8), a bit mask of the float positions (uint16) and the values
+packed as float64 or int32. Class and method names are opcodes and argument names are not stored,
+decode_chromosome takes them from the TestCluster of the TestFactory it binds the chromosome to.
+"""
+from __future__ import annotations
+import math
+import numbers
+import struct
+from typing import TYPE_CHECKING
+import core.statement as stmt
+from core.chromosome import TestCaseChromosome
+from core.genome import CALLABLES, OPCODES, Opcode, create_test_case, decode_entity, encode_entity
+from core.testcase import TestCase
+if TYPE_CHECKING:
+    from core.factory import TestFactory
+    from core.parse_module import TestCluster
+
+MAGIC = b'ADVS'
+FORMAT_VERSION = 1
+
+_HEADER = struct.Struct('<4sBH')
+_RANK_CROWDING = struct.Struct('<id')
+_STATEMENT = struct.Struct('<BBH')
+_BLOCK = struct.Struct('<BH')
+_KIND = struct.Struct('<B')
+
+
+def _encode_values(values: list) -> bytes:
+    if len(values) > 16:
+        raise ValueError("cannot encode more than 16 values, got {}".format(len(values)))
+    mask = 0
+    fmt = '<'
+    for i, value in enumerate(values):
+        if isinstance(value, numbers.Integral) and not isinstance(value, bool):
+            fmt += 'i'
+        else:
+            mask |= 1 << i
+            fmt += 'd'
+    return _BLOCK.pack(len(values), mask) + struct.pack(fmt, *values)
+
+
+def _decode_values(data: memoryview, offset: int) -> tuple[list, int]:
+    count, mask = _BLOCK.unpack_from(data, offset)
+    offset += _BLOCK.size
+    fmt = '<' + ''.join('d' if mask >> i & 1 else 'i' for i in range(count))
+    values = list(struct.unpack_from(fmt, data, offset))
+    return values, offset + struct.calcsize(fmt)
+
+
+def encode_test_case(test_case: TestCase) -> bytes:
+    parts = [_HEADER.pack(MAGIC, FORMAT_VERSION, test_case.size())]
+    parts.extend(_encode_statement(statement) for statement in test_case.statements)
+    return b''.join(parts)
+
+
+def statement_fields(statement: stmt.Statement) -> tuple[int, int, int, list]:
+    """Opcode, entity kind, entity number and argument values of a statement"""
+    if isinstance(statement, stmt.ConstructorStatement):
+        opcode = OPCODES[statement.class_name, statement.class_name]
+        kind, number = encode_entity(statement.assignee)
+    else:
+        opcode = OPCODES[statement.class_name, statement.method_name]
+        kind, number = encode_entity(statement.callee)
+    return opcode, kind, number, list(statement.args.values())
+
+
+def _encode_statement(statement: stmt.Statement) -> bytes:
+    opcode, kind, number, values = statement_fields(statement)
+    return _STATEMENT.pack(opcode, kind, number) + _encode_values(values)
+
+
+def _read_header(data: memoryview) -> int:
+    magic, version, size = _HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError("not an encoded test case")
+    if version != FORMAT_VERSION:
+        raise ValueError("unsupported test case format version {}".format(version))
+    return size
+
+
+def _decode_statements(data: memoryview, offset: int, size: int, test_cluster: TestCluster) -> tuple[TestCase, int]:
+    test_case = create_test_case()
+    methods = {(method.class_name, method.method_name): method
+               for method in test_cluster.road_methods + test_cluster.npc_methods}
+    for _ in range(size):
+        opcode, kind, number = _STATEMENT.unpack_from(data, offset)
+        values, offset = _decode_values(data, offset + _STATEMENT.size)
+        class_name, method_name = CALLABLES[Opcode(opcode)]
+        is_constructor = class_name == method_name
+        callable_data = test_cluster.constructor[class_name] if is_constructor else methods[class_name, method_name]
+        if len(callable_data.args) != len(values):
+            raise ValueError("{}.{} takes {} arguments, {} were encoded".format(
+                class_name, method_name, len(callable_data.args), len(values)))
+        args = dict(zip(callable_data.args.keys(), values))
+        if is_constructor:
+            statement = stmt.ConstructorStatement(test_case, callable_data.module_name, callable_data.class_name,
+                                                  callable_data.method_name, args, decode_entity(kind, number))
+        else:
+            statement = stmt.MethodStatement(test_case, class_name, decode_entity(kind, number), method_name, args)
+        test_case.append_statement(statement)
+    return test_case, offset
+
+
+def decode_test_case(data: bytes, test_cluster: TestCluster) -> TestCase:
+    view = memoryview(data)
+    test_case, _ = _decode_statements(view, _HEADER.size, _read_header(view), test_cluster)
+    return test_case
+
+
+def encode_chromosome(chrom: TestCaseChromosome) -> bytes:
+    rank = -1 if chrom.rank is None else chrom.rank
+    crowding = math.nan if chrom.crowding is None else chrom.crowding
+    fitness = chrom.fitness
+    if isinstance(fitness, (list, tuple)):
+        fitness_part = _KIND.pack(1 if fitness else 0) + _encode_values(list(fitness))
+    else:
+        # the AV-Fuzzer search keeps a scalar fitness
+        fitness_part = _KIND.pack(2) + _encode_values([fitness])
+    parts = [_HEADER.pack(MAGIC, FORMAT_VERSION, chrom.test_case.size()),
+             _RANK_CROWDING.pack(int(rank), float(crowding)), fitness_part]
+    parts.extend(_encode_statement(statement) for statement in chrom.test_case.statements)
+    return b''.join(parts)
+
+
+def decode_chromosome(data: bytes, test_factory: TestFactory) -> TestCaseChromosome:
+    view = memoryview(data)
+    size = _read_header(view)
+    rank, crowding = _RANK_CROWDING.unpack_from(view, _HEADER.size)
+    offset = _HEADER.size + _RANK_CROWDING.size
+    (kind,) = _KIND.unpack_from(view, offset)
+    fitness, offset = _decode_values(view, offset + _KIND.size)
+    test_case, _ = _decode_statements(view, offset, size, test_factory.test_cluster)
+
+    chrom = TestCaseChromosome(test_case, test_factory)
+    chrom.fitness = fitness[0] if kind == 2 else fitness
+    chrom.rank = None if rank < 0 else rank
+    chrom.crowding = None if math.isnan(crowding) else crowding
+    return chrom
@@ -6,7 +6,7 @@ from scenariogeneration import xosc, xodr
 import core.chromosome as chromosome
 import core.statement as stmt
 import numpy as np
-from utils import randomness
+from utils import randomness, profiler, tracer
 
 
 @dataclasses.dataclass
@@ -163,20 +163,21 @@ class RoadConverter:
         road.add_predecessor(xodr.ElementType.road, transition_road.id, xodr.ContactPoint.end)
 
     def convert(self):
-        self.preprocess()
-
-        for road in self.roads:
-            self.odr.add_road(road)
-        for transition_road in self.transition_roads:
-            self.odr.add_road(transition_road)
-        for junction_road in self.junction_roads:
-            self.odr.add_road(junction_road)
-        for junction in self.junctions:
-            self.odr.add_junction(junction)
-
-        self.odr.adjust_startpoints()
-        path = '{your_path}'
-        self.odr.write_xml(path)
+        with profiler.TIMER.phase('road_conversion'), tracer.TRACER.span('road_conversion', 'conversion'):
+            self.preprocess()
+
+            for road in self.roads:
+                self.odr.add_road(road)
+            for transition_road in self.transition_roads:
+                self.odr.add_road(transition_road)
+            for junction_road in self.junction_roads:
+                self.odr.add_road(junction_road)
+            for junction in self.junctions:
+                self.odr.add_junction(junction)
+
+            self.odr.adjust_startpoints()
+            path = '{your_path}'
+            self.odr.write_xml(path)
 
     def contract(self, road_data: Road, road: xodr.Road, start_position, deformation_length):
         coeff0 = self.get_coeff_for_poly3(road_data.geo.length, road_data.width, 0, deformation_length)
@@ -571,26 +572,27 @@ class ScenarioConverter:
                                       self.entities, self.storyboard, self.road, self.catalog, osc_minor_version=1)
 
     def convert(self):
-        self.init_environment_action()
-
-        for statement in self._test_case_chromosome.test_case.statements:
-            if isinstance(statement, stmt.ConstructorStatement) and statement.class_name == 'NPC':
-                self.entities.add_scenario_object(statement.assignee, self.create_vehicle(statement.assignee))
-                self.init_vehicle_action(statement.assignee, statement.args['road_id'], statement.args['init_s'], statement.args['init_t'],
-                                         statement.args['init_speed'])
-            elif isinstance(statement, stmt.MethodStatement) and statement.class_name == 'NPC':
-                if self.maneuver_group_set.get(statement.callee) is None:
-                    maneuver_group = xosc.ManeuverGroup(statement.callee, maxexecution=1)
-                    maneuver_group.add_actor(statement.callee)
-                    self.maneuver_group_set[statement.callee] = maneuver_group
-                self.add_action(statement.callee, statement.method_name, statement.args)
-        self.create_act()
-        self.create_storyboard()
-        self.create_scenario()
-
-        # generate OpenScenario file
-        path = '{your_path}'
-        self.scenario.write_xml(path)
+        with profiler.TIMER.phase('scenario_conversion'), tracer.TRACER.span('scenario_conversion', 'conversion'):
+            self.init_environment_action()
+
+            for statement in self._test_case_chromosome.test_case.statements:
+                if isinstance(statement, stmt.ConstructorStatement) and statement.class_name == 'NPC':
+                    self.entities.add_scenario_object(statement.assignee, self.create_vehicle(statement.assignee))
+                    self.init_vehicle_action(statement.assignee, statement.args['road_id'], statement.args['init_s'], statement.args['init_t'],
+                                             statement.args['init_speed'])
+                elif isinstance(statement, stmt.MethodStatement) and statement.class_name == 'NPC':
+                    if self.maneuver_group_set.get(statement.callee) is None:
+                        maneuver_group = xosc.ManeuverGroup(statement.callee, maxexecution=1)
+                        maneuver_group.add_actor(statement.callee)
+                        self.maneuver_group_set[statement.callee] = maneuver_group
+                    self.add_action(statement.callee, statement.method_name, statement.args)
+            self.create_act()
+            self.create_storyboard()
+            self.create_scenario()
+
+            # generate OpenScenario file
+            path = '{your_path}'
+            self.scenario.write_xml(path)
 
 
 if __name__ == '__main__':
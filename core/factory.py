@@ -3,6 +3,7 @@ import re
 from typing import TYPE_CHECKING
 from core.parse_module import TestCluster, CallableData
 from core.testcase import TestCase
+from core.genome import create_test_case
 from core.chromosome import TestCaseChromosome
 from utils import randomness
 import core.statement as stmt
@@ -18,6 +19,10 @@ class TestFactory:
     def __init__(self, test_cluster: TestCluster):
         self._test_cluster = test_cluster
 
+    @property
+    def test_cluster(self):
+        return self._test_cluster
+
     @staticmethod
     def create_variables(type_name, bounds: list):
         match type_name:
@@ -28,7 +33,7 @@ class TestFactory:
             case 'float':
                 return randomness.next_float(bounds[0], bounds[1])
             case _:
-                print("unknown type")
+                logger.debug("unknown type %s", type_name)
         return None
 
     def insert_constructor_statement(self, test_case: TestCase, assignee: str, arg_list: list, position: int):
@@ -37,7 +42,6 @@ class TestFactory:
         args = {key: value for key, value in zip(constructor_data.args.keys(), arg_list)}
         statement = stmt.ConstructorStatement(test_case, constructor_data.module_name, constructor_data.class_name,
                                               constructor_data.method_name, args, assignee)
-        statement.stmt_to_ast()
         test_case.add_statement(statement, position)
 
     def insert_method_statement(self, test_case: TestCase, callee: str, method_name: str, arg_list: list, position):
@@ -50,7 +54,6 @@ class TestFactory:
             statement = stmt.MethodStatement(test_case, 'Road', callee, method_name, args)
         else:
             statement = stmt.MethodStatement(test_case, 'NPC', callee, method_name, args)
-        statement.stmt_to_ast()
         test_case.add_statement(statement, position)
 
     def insert_random_constructor_statement(self, constructor_name: str, test_case: TestCase, position: int):
@@ -76,7 +79,6 @@ class TestFactory:
         statement = stmt.ConstructorStatement(test_case, constructor_data.module_name,
                                               constructor_data.class_name, constructor_data.method_name,
                                               args, assignee)
-        statement.stmt_to_ast()
         test_case.add_statement(statement, position)
 
     @staticmethod
@@ -136,7 +138,6 @@ class TestFactory:
 
         statement = stmt.ConstructorStatement(test_case, constructor_data.module_name, constructor_data.class_name,
                                               constructor_data.method_name, args, assignee)
-        statement.stmt_to_ast()
         global_position = test_case.add_statement(statement, position)
 
         return global_position
@@ -236,15 +237,11 @@ class TestFactory:
                 args['lanes'] = self.create_variables('int', [1, int(cur_road_lane_num / 2) + 1])
 
         statement = stmt.MethodStatement(test_case, 'Road', callee, candidate_method.method_name, args)
-        statement.stmt_to_ast()
         test_case.add_statement(statement, position)
 
     @staticmethod
     def has_shape_change(test_case: TestCase, road: stmt.ConstructorStatement):
-        for statement in test_case.road_statements:
-            if isinstance(statement, stmt.MethodStatement) and statement.callee == road.assignee:
-                return True
-        return False
+        return test_case.shape_change(road.assignee) is not None
 
     def check_validity(self, pre_road: stmt.ConstructorStatement, pre_road_method: stmt.MethodStatement | None,
                        suc_road: stmt.ConstructorStatement, suc_road_method: stmt.MethodStatement | None):
@@ -274,15 +271,8 @@ class TestFactory:
         # constructor part
         pre_road = test_case.road_constructors[position - 1] if position > 0 else None
         suc_road = test_case.road_constructors[position] if position < test_case.road_size() else None
-        pre_road_method = None
-        suc_road_method = None
-        for statement in test_case.road_statements:
-            if isinstance(statement, stmt.MethodStatement) and (
-                    pre_road is not None and statement.callee == pre_road.assignee):
-                pre_road_method = statement
-            if isinstance(statement, stmt.MethodStatement) and (
-                    suc_road is not None and statement.callee == suc_road.assignee):
-                suc_road_method = statement
+        pre_road_method = test_case.shape_change(pre_road.assignee) if pre_road is not None else None
+        suc_road_method = test_case.shape_change(suc_road.assignee) if suc_road is not None else None
 
         pre_road_lane_num = self.calculate_road_lane_num(pre_road, pre_road_method)[0] if pre_road is not None else \
             config.scenario_config.lane_num[0]
@@ -299,8 +289,7 @@ class TestFactory:
                                                       [max(config.scenario_config.lane_num[0], suc_road_lane_num - 1),
                                                        min(pre_road_lane_num + 1, config.scenario_config.lane_num[1])])
                 else:
-                    print('pre lane num', pre_road_lane_num)
-                    print('suc lane num', suc_road_lane_num)
+                    self.logger.debug("pre lane num %d, suc lane num %d", pre_road_lane_num, suc_road_lane_num)
                     args[key] = self.create_variables('int', [min(pre_road_lane_num, suc_road_lane_num),
                                                               max(pre_road_lane_num, suc_road_lane_num) + 1])
             else:
@@ -308,21 +297,14 @@ class TestFactory:
 
         # update other roads
         for other_road in reversed(test_case.road_constructors[position:]):
-            print('other road', other_road.assignee)
-            for i in range(len(test_case.statements)):
-                if isinstance(test_case.statements[i], stmt.ConstructorStatement) and test_case.statements[i].assignee == other_road.assignee:
-                    test_case.statements[i].assignee = 'road{}'.format(int(test_case.statements[i].assignee[-1]) + 1)
-                    test_case.statements[i].stmt_to_ast()
-                    if (i + 1) < len(test_case.statements) and isinstance(test_case.statements[i + 1], stmt.MethodStatement):
-                        test_case.statements[i + 1].callee = 'road{}'.format(int(test_case.statements[i + 1].callee[-1]) + 1)
-                        test_case.statements[i + 1].stmt_to_ast()
+            self.logger.debug("other road %s", other_road.assignee)
+            test_case.rename_entity(other_road.assignee, 'road{}'.format(int(other_road.assignee[-1]) + 1))
 
         assignee = 'road{}'.format(position)
         constructor_statement = stmt.ConstructorStatement(test_case, constructor_data.module_name,
                                                           constructor_data.class_name,
                                                           constructor_data.method_name,
                                                           args, assignee)
-        constructor_statement.stmt_to_ast()
 
         # method part
         cur_road = constructor_statement
@@ -365,7 +347,6 @@ class TestFactory:
         cur_road_method = None
         if flag is True:
             cur_road_method = stmt.MethodStatement(test_case, 'Road', callee, candidate_method.method_name, args)
-            cur_road_method.stmt_to_ast()
 
         validity = False
         if pre_road is None:
@@ -384,15 +365,8 @@ class TestFactory:
         cur_road = test_case.road_constructors[position]
         pre_road = test_case.road_constructors[position - 1] if position > 0 else None
         suc_road = test_case.road_constructors[position + 1] if position + 1 < test_case.road_size() else None
-        pre_road_method = None
-        suc_road_method = None
-        for statement in test_case.road_statements:
-            if isinstance(statement, stmt.MethodStatement) and (
-                    pre_road is not None and statement.callee == pre_road.assignee):
-                pre_road_method = statement
-            if isinstance(statement, stmt.MethodStatement) and (
-                    suc_road is not None and statement.callee == suc_road.assignee):
-                suc_road_method = statement
+        pre_road_method = test_case.shape_change(pre_road.assignee) if pre_road is not None else None
+        suc_road_method = test_case.shape_change(suc_road.assignee) if suc_road is not None else None
 
         validity = False
         if pre_road is None or suc_road is None:
@@ -402,59 +376,39 @@ class TestFactory:
 
         if validity:
             if position == test_case.road_size() - 1:
-                for st in test_case.statements:
-                    if isinstance(st, stmt.ConstructorStatement) and st.class_name == 'NPC':
-                        if st.args['road_id'] == int(cur_road.assignee[-1]):
-                            self.logger.info("update road_id for %s", st.assignee)
-                            st.args['road_id'] = int(cur_road.assignee[-1]) - 1
-                            st.stmt_to_ast()
+                for st in test_case.vehicles:
+                    if st.args['road_id'] == int(cur_road.assignee[-1]):
+                        self.logger.info("update road_id for %s", st.assignee)
+                        st = test_case.writable(st)
+                        st.args['road_id'] = int(cur_road.assignee[-1]) - 1
+                        st.invalidate_ast()
 
             test_case.delete_road(cur_road)
             self.logger.info("success delete road %d", position)
 
             # update other roads and npcs
             for other_road in test_case.road_constructors[position:]:
-                print('other road', other_road.assignee)
-                for i in range(len(test_case.statements)):
-                    if isinstance(test_case.statements[i], stmt.ConstructorStatement) and test_case.statements[i].assignee == other_road.assignee:
-                        # update npc on other road
-                        for st in test_case.statements:
-                            if isinstance(st, stmt.ConstructorStatement) and st.class_name == 'NPC':
-                                if st.args['road_id'] == int(test_case.statements[i].assignee[-1]):
-                                    self.logger.info("update road_id for %s", st.assignee)
-                                    st.args['road_id'] = int(test_case.statements[i].assignee[-1]) - 1
-                                    st.stmt_to_ast()
-
-                        test_case.statements[i].assignee = 'road{}'.format(
-                            int(test_case.statements[i].assignee[-1]) - 1)
-                        test_case.statements[i].stmt_to_ast()
-                        if (i + 1) < len(test_case.statements) and isinstance(test_case.statements[i + 1],
-                                                                              stmt.MethodStatement):
-                            test_case.statements[i + 1].callee = 'road{}'.format(
-                                int(test_case.statements[i + 1].callee[-1]) - 1)
-                            test_case.statements[i + 1].stmt_to_ast()
+                self.logger.debug("other road %s", other_road.assignee)
+                road_id = int(other_road.assignee[-1])
+                # update npc on other road
+                for st in test_case.vehicles:
+                    if st.args['road_id'] == road_id:
+                        self.logger.info("update road_id for %s", st.assignee)
+                        st = test_case.writable(st)
+                        st.args['road_id'] = road_id - 1
+                        st.invalidate_ast()
+
+                test_case.rename_entity(other_road.assignee, 'road{}'.format(road_id - 1))
         else:
             self.logger.info("fail to delete road{}".format(position))
 
     def check_road_change_validity(self, test_case: TestCase, other_test_case: TestCase, position):
         other_road = other_test_case.road_constructors[position]
-        other_road_method = None
         pre_road = test_case.road_constructors[position - 1] if position > 0 else None
         suc_road = test_case.road_constructors[position] if position < test_case.road_size() else None
-        pre_road_method = None
-        suc_road_method = None
-
-        for statement in test_case.road_statements:
-            if isinstance(statement, stmt.MethodStatement) and (
-                    pre_road is not None and statement.callee == pre_road.assignee):
-                pre_road_method = statement
-            if isinstance(statement, stmt.MethodStatement) and (
-                    suc_road is not None and statement.callee == suc_road.assignee):
-                suc_road_method = statement
-
-        for st in other_test_case.road_statements:
-            if isinstance(st, stmt.MethodStatement) and st.callee == other_road.assignee:
-                other_road_method = st
+        pre_road_method = test_case.shape_change(pre_road.assignee) if pre_road is not None else None
+        suc_road_method = test_case.shape_change(suc_road.assignee) if suc_road is not None else None
+        other_road_method = other_test_case.shape_change(other_road.assignee)
 
         road_validity = False
 
@@ -473,22 +427,12 @@ class TestFactory:
     def mutation_change_road(self, test_case: TestCase, position: int):
         self.logger.info("mutate_change road%d", position)
         road = test_case.road_constructors[position]
-        road_method = None
-        for statement in test_case.road_statements:
-            if isinstance(statement, stmt.MethodStatement) and statement.callee == road.assignee:
-                road_method = statement
+        road_method = test_case.shape_change(road.assignee)
 
         pre_road = test_case.road_constructors[position - 1] if position > 0 else None
         suc_road = test_case.road_constructors[position] if position < test_case.road_size() else None
-        pre_road_method = None
-        suc_road_method = None
-        for statement in test_case.road_statements:
-            if isinstance(statement, stmt.MethodStatement) and (
-                    pre_road is not None and statement.callee == pre_road.assignee):
-                pre_road_method = statement
-            if isinstance(statement, stmt.MethodStatement) and (
-                    suc_road is not None and statement.callee == suc_road.assignee):
-                suc_road_method = statement
+        pre_road_method = test_case.shape_change(pre_road.assignee) if pre_road is not None else None
+        suc_road_method = test_case.shape_change(suc_road.assignee) if suc_road is not None else None
 
         clone_road: stmt.ConstructorStatement = road.clone(test_case)
         clone_road.mutate_road()
@@ -504,13 +448,13 @@ class TestFactory:
 
         self.logger.info("road_validity is %s", str(road_validity))
 
+        road = test_case.writable(road)
         for name, value in road.args.items():
             if name == 'lane_num' and road_validity:
                 road.args[name] = clone_road.args[name]
             road.args[name] = clone_road.args[name]
 
-        road.stmt_to_ast()
-        clone_road.stmt_to_ast()
+        road.invalidate_ast()
 
         # method part
         road_length = road.args['length']
@@ -524,8 +468,7 @@ class TestFactory:
             if flag is False:
                 # current road method could not match the mutated road
                 self.logger.info("remove the road method")
-                test_case.statements.remove(road_method)
-                test_case.road_statements.remove(road_method)
+                test_case.remove_statement(road_method)
             else:
                 method_validity = False
                 if pre_road is None:
@@ -538,12 +481,13 @@ class TestFactory:
 
                 self.logger.info("method_validity is %s", str(method_validity))
 
+                road_method = test_case.writable(road_method)
                 for name, value in clone_road_method.args.items():
                     if name == 'lanes' and method_validity:
                         road_method.args['lanes'] = clone_road_method.args['lanes']
                     road_method.args[name] = clone_road_method.args[name]
 
-                road_method.stmt_to_ast()
+                road_method.invalidate_ast()
 
     def insert_random_npc_constructor(self, test_case: TestCase, position: int):
         constructor_data: CallableData = self._test_cluster.constructor['NPC']
@@ -572,7 +516,6 @@ class TestFactory:
         statement = stmt.ConstructorStatement(test_case, constructor_data.module_name, constructor_data.class_name,
                                               constructor_data.method_name,
                                               args, assignee)
-        statement.stmt_to_ast()
         test_case.add_statement(statement, len(test_case.road_statements) + position)
 
     def avfuzzer_insert_random_npc_constructor(self, test_case: TestCase, position: int):
@@ -605,7 +548,6 @@ class TestFactory:
         statement = stmt.ConstructorStatement(test_case, constructor_data.module_name, constructor_data.class_name,
                                               constructor_data.method_name,
                                               args, assignee)
-        statement.stmt_to_ast()
         test_case.add_statement(statement, len(test_case.road_statements) + position)
 
     def insert_random_npc_method(self, test_case: TestCase, position: int, fixed_callee: str | None = None):
@@ -619,15 +561,12 @@ class TestFactory:
         for key, value in method_data.args.items():
             args[key] = self.create_variables(str(value), config.scenario_config.__dict__[key])
         statement = stmt.MethodStatement(test_case, 'NPC', callee, method_data.method_name, args)
-        statement.stmt_to_ast()
         test_case.add_statement(statement, position)
 
     @staticmethod
     def append_statement(test_case: TestCase, statement: stmt.Statement, position: int = -1):
         new_position = test_case.size() if position == -1 else position
-        clone_statement: stmt.Statement = statement.clone(test_case)
-        clone_statement.stmt_to_ast()
-        test_case.add_statement(clone_statement, new_position)
+        test_case.add_statement(statement.clone(test_case), new_position)
 
     @staticmethod
     def delete_statement(test_case: TestCase, position: int):
@@ -647,7 +586,7 @@ class TestCaseFactory:
         self._test_factory = test_factory
 
     def generate_random_testcase(self) -> TestCase:
-        test_case = TestCase()
+        test_case = create_test_case()
 
         # Road
         road_num = randomness.next_int(config.ga_config.min_road_num + 1, config.ga_config.max_road_num + 1)
@@ -675,6 +614,10 @@ class TestCaseChromosomeFactory:
         self._test_factory = test_factory
         self._test_case_factory = test_case_factory
 
+    @property
+    def test_factory(self):
+        return self._test_factory
+
     def generate_chromosome(self) -> TestCaseChromosome:
         logger.info("start generate a chromosome")
         test_case = self._test_case_factory.generate_random_testcase()
@@ -683,7 +626,7 @@ class TestCaseChromosomeFactory:
         return chrom
 
     def avfuzzer_generate_chromosome(self):
-        test_case = TestCase()
+        test_case = create_test_case()
         self._test_factory.insert_constructor_statement(test_case, 'road0', [-0.0000000019615, 0.000000088191864, 200.0000, 6, 3.5], test_case.size())
         self._test_factory.insert_constructor_statement(test_case, 'road1', [-0.0000000019615, 0.000000088191864, 200.0000, 6, 3.5], test_case.size())
         for i in range(3):  # one ego and  NPCs
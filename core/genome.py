@@ -0,0 +1,490 @@
+"""Array-backed storage of test cases.
+
+ArrayTestCase keeps its statements as rows of a NumPy structured array, ROW_DTYPE:
+
+    opcode      class and method of the statement (Opcode)
+    kind        entity kind of the assignee of a constructor or the callee of a method (Entity)
+    number      entity number, 3 for road3 or npc3
+    road        road of the statement: the road number of road statements, road_id of NPC constructors,
+                -1 for NPC actions
+    ints        bit mask of the parameters that are ints
+    params      the argument values, float64, in the order of the signature
+
+and hands out statement views, ConstructorStatement and MethodStatement subclasses that read and
+write their row, so TestFactory, TestCaseChromosome and the converters work on either storage.
+Rows are never moved while a test case lives, a view stays valid until its statement is removed.
+"""
+from __future__ import annotations
+import ast
+import numbers
+import re
+from collections.abc import MutableMapping, Sequence
+from enum import IntEnum
+from itertools import islice
+import numpy as np
+import core.statement as stmt
+from core.testcase import TestCase
+from configuration import configuration as config
+
+# arguments of the longest signature, Road
+PARAMS = 5
+
+ROW_DTYPE = np.dtype([
+    ('opcode', 'u1'),
+    ('kind', 'u1'),
+    ('number', '<u2'),
+    ('road', '<i2'),
+    ('ints', 'u1'),
+    ('params', '<f8', (PARAMS,)),
+])
+
+
+class Opcode(IntEnum):
+    """Class and method of a statement, one per callable of the scenario module"""
+    ROAD = 1
+    NPC = 2
+    CONTRACT = 3
+    EXPAND = 4
+    MERGE = 5
+    SPLIT = 6
+    SPEED_ACTION = 7
+    LANE_CHANGE_ACTION = 8
+    LANE_OFFSET_ACTION = 9
+
+
+class Entity(IntEnum):
+    ROAD = 0
+    NPC = 1
+    EGO = 2
+
+
+CALLABLES = {
+    Opcode.ROAD: ('Road', 'Road'),
+    Opcode.NPC: ('NPC', 'NPC'),
+    Opcode.CONTRACT: ('Road', 'contract'),
+    Opcode.EXPAND: ('Road', 'expand'),
+    Opcode.MERGE: ('Road', 'merge'),
+    Opcode.SPLIT: ('Road', 'split'),
+    Opcode.SPEED_ACTION: ('NPC', 'speedAction'),
+    Opcode.LANE_CHANGE_ACTION: ('NPC', 'laneChangeAction'),
+    Opcode.LANE_OFFSET_ACTION: ('NPC', 'laneOffsetAction'),
+}
+OPCODES = {callable_name: opcode for opcode, callable_name in CALLABLES.items()}
+# plain ints, the members of an IntEnum are slow to look up on hot paths
+_ROAD, _NPC = int(Opcode.ROAD), int(Opcode.NPC)
+_CONSTRUCTORS = frozenset((_ROAD, _NPC))
+_ROAD_ENTITY, _NPC_ENTITY, _EGO_ENTITY = int(Entity.ROAD), int(Entity.NPC), int(Entity.EGO)
+
+_ENTITY_NAME = re.compile(r'(road|npc)(\d+)$')
+
+# opcode -> (module name, argument names), learnt from the statements stored in this process
+_SIGNATURES: dict[int, tuple[str, tuple[str, ...]]] = {}
+
+
+def encode_entity(name: str) -> tuple[int, int]:
+    if name == 'Ego':
+        return Entity.EGO, 0
+    match = _ENTITY_NAME.match(name)
+    if match is None:
+        raise ValueError("cannot encode the entity name {}".format(name))
+    return (Entity.ROAD if match.group(1) == 'road' else Entity.NPC), int(match.group(2))
+
+
+_ENTITY_PREFIX = {int(Entity.ROAD): 'road', int(Entity.NPC): 'npc'}
+
+
+def decode_entity(kind: int, number: int) -> str:
+    if kind == _EGO_ENTITY:
+        return 'Ego'
+    return _ENTITY_PREFIX[kind] + str(number)
+
+
+def create_test_case() -> TestCase:
+    """An empty test case of the storage selected by config.ga_config.genome_storage"""
+    return ArrayTestCase() if config.ga_config.genome_storage == 'arrays' else TestCase()
+
+
+class ArgsView(MutableMapping):
+    """The args dict of a statement view, backed by the params of its row"""
+    __slots__ = ('_test_case', '_slot')
+
+    def __init__(self, test_case: ArrayTestCase, slot: int):
+        self._test_case = test_case
+        self._slot = slot
+
+    def _names(self) -> tuple[str, ...]:
+        return _SIGNATURES[int(self._test_case.rows['opcode'][self._slot])][1]
+
+    def __getitem__(self, name: str):
+        row = self._test_case.rows[self._slot]
+        try:
+            index = _SIGNATURES[int(row['opcode'])][1].index(name)
+        except ValueError:
+            raise KeyError(name) from None
+        value = row['params'][index]
+        return int(value) if row['ints'] >> index & 1 else float(value)
+
+    def __setitem__(self, name: str, value):
+        rows = self._test_case.rows
+        try:
+            index = self._names().index(name)
+        except ValueError:
+            raise KeyError(name) from None
+        rows['params'][self._slot, index] = value
+        if isinstance(value, numbers.Integral) and not isinstance(value, bool):
+            rows['ints'][self._slot] |= 1 << index
+        else:
+            rows['ints'][self._slot] &= ~(1 << index) & 0xff
+        if name == 'road_id' and rows['opcode'][self._slot] == Opcode.NPC:
+            rows['road'][self._slot] = int(value)
+
+    def __delitem__(self, name: str):
+        raise TypeError("the arguments of a statement are fixed by its signature")
+
+    def __iter__(self):
+        return iter(self._names())
+
+    def __len__(self):
+        return len(self._names())
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class _StatementView:
+    """Fields of a statement read from, and written to, a row of an ArrayTestCase"""
+    # the slots are declared by the concrete views, Statement has a layout of its own
+    __slots__ = ()
+
+    def __init__(self, test_case: ArrayTestCase, slot: int):
+        self._owner = test_case
+        self._slot = slot
+
+    def __eq__(self, other):
+        return isinstance(other, _StatementView) and other._owner is self._owner and other._slot == self._slot
+
+    def __hash__(self):
+        return hash((id(self._owner), self._slot))
+
+    @property
+    def slot(self) -> int:
+        return self._slot
+
+    @property
+    def test_case(self):
+        return self._owner
+
+    @property
+    def _class_name(self):
+        return CALLABLES[int(self._owner.rows['opcode'][self._slot])][0]
+
+    @property
+    def _args(self):
+        return ArgsView(self._owner, self._slot)
+
+    @property
+    def ast_node(self):
+        # built on every access, an array test case holds no AST
+        return self.build_ast()
+
+    def _entity(self) -> str:
+        row = self._owner.rows[self._slot]
+        return decode_entity(int(row['kind']), int(row['number']))
+
+    def _set_entity(self, name: str):
+        rows = self._owner.rows
+        rows['kind'][self._slot], rows['number'][self._slot] = encode_entity(name)
+        if rows['kind'][self._slot] == Entity.ROAD:
+            rows['road'][self._slot] = rows['number'][self._slot]
+
+    def stmt_to_ast(self):
+        pass
+
+    def invalidate_ast(self):
+        pass
+
+
+class ConstructorView(_StatementView, stmt.ConstructorStatement):
+    __slots__ = ('_owner', '_slot')
+
+    @property
+    def _module_name(self):
+        return _SIGNATURES[int(self._owner.rows['opcode'][self._slot])][0]
+
+    @property
+    def _constructor_name(self):
+        return self._class_name
+
+    @property
+    def _assignee(self):
+        return self._entity()
+
+    @_assignee.setter
+    def _assignee(self, name: str):
+        self._set_entity(name)
+
+    @property
+    def _callee(self):
+        return self._class_name
+
+
+class MethodView(_StatementView, stmt.MethodStatement):
+    __slots__ = ('_owner', '_slot')
+
+    @property
+    def _method_name(self):
+        return CALLABLES[int(self._owner.rows['opcode'][self._slot])][1]
+
+    @property
+    def _assignee(self):
+        return None
+
+    @property
+    def _callee(self):
+        return self._entity()
+
+    @_callee.setter
+    def _callee(self, name: str):
+        self._set_entity(name)
+
+
+class StatementList(Sequence):
+    """Views of the statements of an ArrayTestCase in the given slots"""
+    __slots__ = ('_test_case', '_slots')
+
+    def __init__(self, test_case: ArrayTestCase, slots: list[int]):
+        self._test_case = test_case
+        self._slots = slots
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._test_case.view(slot) for slot in self._slots[index]]
+        return self._test_case.view(self._slots[index])
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __iter__(self):
+        view = self._test_case.view
+        return (view(slot) for slot in list(self._slots))
+
+    def __reversed__(self):
+        view = self._test_case.view
+        return (view(slot) for slot in reversed(list(self._slots)))
+
+    def __contains__(self, statement):
+        return isinstance(statement, _StatementView) and statement._owner is self._test_case \
+            and statement.slot in self._slots
+
+    def remove(self, statement: _StatementView):
+        self._test_case.remove_statement(statement)
+
+
+class ArrayTestCase(TestCase):
+    """A TestCase whose statements are rows of a structured array, see the module docstring.
+
+    Statements added to it are copied into a row, afterwards they have to be changed through the
+    views of statements, road_statements and road_constructors. Removed rows are only reclaimed by
+    clone, which copies the rows of the remaining statements in order.
+    """
+    __slots__ = ('_rows', '_used', '_order')
+
+    def __init__(self, capacity: int = 16):
+        self._rows = np.zeros(capacity, dtype=ROW_DTYPE)
+        self._used = 0
+        self._order: list[int] = []
+        self._cursor: int = 0
+        self._ast_node = None
+        self._version: int = 0
+
+    def __getstate__(self):
+        state = {name: getattr(self, name) for name in ('_used', '_order', '_cursor', '_version')}
+        state['_rows'] = self._rows[:self._used]
+        # the process that unpickles the test case may not have seen its signatures yet
+        state['_signatures'] = {opcode: _SIGNATURES[opcode] for opcode in set(self._rows['opcode'][self._order].tolist())}
+        return state
+
+    def __setstate__(self, state):
+        for opcode, signature in state.pop('_signatures').items():
+            _SIGNATURES.setdefault(opcode, signature)
+        for name, value in state.items():
+            setattr(self, name, value)
+        self._ast_node = None
+
+    @property
+    def rows(self) -> np.ndarray:
+        return self._rows
+
+    def view(self, slot: int) -> _StatementView:
+        if int(self._rows['opcode'][slot]) in _CONSTRUCTORS:
+            return ConstructorView(self, slot)
+        return MethodView(self, slot)
+
+    def array(self) -> np.ndarray:
+        """Copy of the rows of the statements, in statement order"""
+        return self._rows[self._order]
+
+    @property
+    def _statements(self) -> StatementList:
+        return StatementList(self, self._order)
+
+    @property
+    def _road_statements(self) -> StatementList:
+        # road statements come first, before the NPCs, as in TestCase
+        kinds = self._rows['kind'].tolist()
+        return StatementList(self, [slot for slot in self._order if kinds[slot] == _ROAD_ENTITY])
+
+    @property
+    def _road_constructors(self) -> StatementList:
+        opcodes = self._rows['opcode'].tolist()
+        return StatementList(self, [slot for slot in self._order if opcodes[slot] == _ROAD])
+
+    @property
+    def vehicles(self) -> StatementList:
+        opcodes = self._rows['opcode'].tolist()
+        return StatementList(self, [slot for slot in self._order if opcodes[slot] == _NPC])
+
+    def npc_size(self) -> int:
+        opcodes, kinds = self._rows['opcode'].tolist(), self._rows['kind'].tolist()
+        return sum(opcodes[slot] == _NPC and kinds[slot] == _NPC_ENTITY for slot in self._order)
+
+    def object_size(self) -> int:
+        opcodes = self._rows['opcode'].tolist()
+        return sum(opcodes[slot] in _CONSTRUCTORS for slot in self._order)
+
+    def action_type_size(self) -> int:
+        opcodes, kinds, numbers = (self._rows[field].tolist() for field in ('opcode', 'kind', 'number'))
+        return len({(kinds[slot], numbers[slot]) for slot in self._order if opcodes[slot] not in _CONSTRUCTORS})
+
+    def _entity_slots(self, entity: str) -> list[int]:
+        kind, number = encode_entity(entity)
+        kinds, numbers = self._rows['kind'].tolist(), self._rows['number'].tolist()
+        return [slot for slot in self._order if kinds[slot] == kind and numbers[slot] == number]
+
+    def constructor(self, entity: str) -> stmt.Statement | None:
+        opcodes = self._rows['opcode'].tolist()
+        slots = [slot for slot in self._entity_slots(entity) if opcodes[slot] in _CONSTRUCTORS]
+        return self.view(slots[-1]) if slots else None
+
+    def methods(self, entity: str) -> list[stmt.Statement]:
+        opcodes = self._rows['opcode'].tolist()
+        return [self.view(slot) for slot in self._entity_slots(entity) if opcodes[slot] not in _CONSTRUCTORS]
+
+    def shape_change(self, road: str) -> stmt.Statement | None:
+        methods = self.methods(road)
+        return methods[-1] if methods else None
+
+    def rename_entity(self, old: str, new: str):
+        if old == new:
+            return
+        if self.constructor(new) is not None:
+            raise ValueError("cannot rename {} to {}, the name is taken".format(old, new))
+        self._version += 1
+        for slot in self._entity_slots(old):
+            self.view(slot)._set_entity(new)
+
+    def set_callee(self, statement: stmt.MethodStatement, callee: str):
+        statement.callee = callee
+
+    def _store(self, statement: stmt.Statement) -> int:
+        """Copy a statement into a new row and return its slot"""
+        if isinstance(statement, stmt.ConstructorStatement):
+            opcode = OPCODES[statement.class_name, statement.class_name]
+            entity = statement.assignee
+        else:
+            opcode = OPCODES[statement.class_name, statement.method_name]
+            entity = statement.callee
+        args = statement.args
+        if opcode not in _SIGNATURES:
+            module_name = statement._module_name if isinstance(statement, stmt.ConstructorStatement) else ''
+            _SIGNATURES[opcode] = (module_name, tuple(args))
+
+        if self._used == len(self._rows):
+            self._rows = np.concatenate([self._rows, np.zeros(max(8, len(self._rows)), dtype=ROW_DTYPE)])
+        slot = self._used
+        self._used += 1
+        row = self._rows[slot]
+        row['opcode'] = opcode
+        row['kind'], row['number'] = encode_entity(entity)
+        row['road'] = row['number'] if row['kind'] == Entity.ROAD else -1
+        ints = 0
+        for index, value in enumerate(args.values()):
+            row['params'][index] = value
+            if isinstance(value, numbers.Integral) and not isinstance(value, bool):
+                ints |= 1 << index
+        row['ints'] = ints
+        if opcode == Opcode.NPC:
+            row['road'] = int(args['road_id'])
+        return slot
+
+    def clone(self, start: int = 0, stop: int | None = None) -> ArrayTestCase:
+        order = list(islice(self._order, start, stop))
+        test_case = ArrayTestCase(0)
+        test_case._rows = self._rows[order]
+        test_case._used = len(order)
+        test_case._order = list(range(len(order)))
+        return test_case
+
+    def writable(self, statement: stmt.Statement) -> stmt.Statement:
+        # clone copies the rows, a view never refers to the rows of another test case
+        return statement
+
+    def append_statement(self, statement: stmt.Statement):
+        self._version += 1
+        self._order.append(self._store(statement))
+
+    def add_statement(self, statement: stmt.Statement, position: int = -1):
+        self._version += 1
+        if statement.class_name == 'Road':
+            if isinstance(statement, stmt.ConstructorStatement):
+                constructors = list(self._road_constructors._slots)
+                slot = self._store(statement)
+                constructors.insert(position, slot)
+                # behind the statements of the roads before it
+                pre_roads = {(Entity.ROAD, self._rows['number'][other]) for other in constructors[:position]}
+                global_position = sum((self._rows['kind'][other], self._rows['number'][other]) in pre_roads
+                                      for other in self._road_statements._slots)
+                self._order.insert(global_position, slot)
+                return global_position
+
+            elif isinstance(statement, stmt.MethodStatement):
+                self._order.insert(position, self._store(statement))
+                return position
+
+        elif statement.class_name == 'NPC':
+            self._order.insert(position, self._store(statement))
+
+    def remove_statement(self, statement: stmt.Statement):
+        self._version += 1
+        self._order.remove(statement.slot)
+
+    def delete_road(self, statement: stmt.ConstructorStatement):
+        self._version += 1
+        for st in self.methods(statement.assignee):
+            self._order.remove(st.slot)
+        self._order.remove(statement.slot)
+
+    def delete_method_statement(self, statement: stmt.MethodStatement):
+        self._version += 1
+        if len(self._order) > config.ga_config.min_testcase_size:
+            self._order.remove(statement.slot)
+
+    def delete_constructor_statement(self, statement: stmt.ConstructorStatement):
+        self._version += 1
+        for method in reversed(self.methods(statement.assignee)):
+            self.delete_method_statement(method)
+
+        if len(self._order) > config.ga_config.min_testcase_size:
+            self._order.remove(statement.slot)
+
+    def get_callees(self) -> list[str]:
+        # the NPC constructors, but the one of the Ego
+        opcodes, kinds, numbers = (self._rows[field].tolist() for field in ('opcode', 'kind', 'number'))
+        return ['npc{}'.format(numbers[slot]) for slot in self._order
+                if opcodes[slot] == _NPC and kinds[slot] == _NPC_ENTITY]
+
+    def test_case_to_ast(self) -> ast.Module:
+        module = super().test_case_to_ast()
+        # the AST is rebuilt on demand, keeping it would cost more than the rows
+        self._ast_node = None
+        return module
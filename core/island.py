@@ -0,0 +1,164 @@
+from __future__ import annotations
+import logging
+import multiprocessing
+import os
+import queue
+import traceback
+import numpy as np
+from core.algorithm import SearchAlgorithm
+from core.checkpoint import is_resumable
+from core.chromosome import TestCaseChromosome
+from core.factory import TestFactory, TestCaseFactory, TestCaseChromosomeFactory
+from core.parse_module import analyse_module
+from core.simulation import Simulation
+from configuration import configuration as config
+from utils import randomness
+
+
+class IslandSearchAlgorithm(SearchAlgorithm):
+    """A SearchAlgorithm that trades its best individuals with its neighbours on a ring of islands."""
+
+    def __init__(
+        self,
+        chromosome_factory: TestCaseChromosomeFactory,
+        index: int,
+        inbox: multiprocessing.Queue,
+        outbox: multiprocessing.Queue,
+    ):
+        super().__init__(chromosome_factory)
+        self.index = index
+        self.inbox = inbox
+        self.outbox = outbox
+        self.neighbour_retired = False
+        # every island writes its own metric and result files
+        self.start_time = '{}_island{}'.format(self.start_time, index)
+
+    def generate_tests(self, resume: str | None = None):
+        best = super().generate_tests(resume)
+        # a search budget may stop the islands at different generations, tell the neighbour not to wait
+        self.outbox.put(None)
+        return best
+
+    def evolve(self):
+        super().evolve()
+        if (self.iteration + 1) % config.ga_config.migration_interval == 0:
+            self.migrate()
+
+    def end_steady_state_generation(self):
+        # the steady-state search counts a generation per population-size evaluations, it migrates at the same ones
+        if self.iteration % config.ga_config.migration_interval == 0:
+            self.migrate()
+
+    def migrate(self):
+        emigrants = [chrom for chrom in self.population if chrom.rank == 0][: config.ga_config.migration_size]
+        self.outbox.put(emigrants)
+        if self.neighbour_retired:
+            return
+        # every island migrates at the same generations, so the neighbour's emigrants arrive unless it retired
+        immigrants: list[TestCaseChromosome] | None = self.inbox.get()
+        if immigrants is None:
+            self.logger.info("the neighbour of island %d retired", self.index)
+            self.neighbour_retired = True
+            return
+        for chrom in immigrants:
+            chrom.test_factory = self.chromosome_factory.test_factory
+        self.logger.info("island %d received %d immigrants", self.index, len(immigrants))
+        self.population = self.get_survivals(self.population + immigrants, n_survival=config.ga_config.population)
+
+
+def _run_island(index: int, module_name: str, simulation: Simulation, seed: int, resume: bool,
+                inbox: multiprocessing.Queue, outbox: multiprocessing.Queue, results: multiprocessing.Queue):
+    randomness.RNG.seed(seed + index)
+    np.random.seed((seed + index) % 2 ** 32)
+    if config.ga_config.archive_path is not None:
+        # an archive has a single writer, every island appends to its own
+        config.ga_config.archive_path = os.path.join(config.ga_config.archive_path, 'island{}'.format(index))
+    # likewise for the metrics and the trace, one endpoint and one file per island
+    if config.ga_config.metrics_port > 0:
+        config.ga_config.metrics_port += index
+    if config.ga_config.metrics_path is not None:
+        root, extension = os.path.splitext(config.ga_config.metrics_path)
+        config.ga_config.metrics_path = '{}_island{}{}'.format(root, index, extension)
+    if config.ga_config.trace_path is not None:
+        root, extension = os.path.splitext(config.ga_config.trace_path)
+        config.ga_config.trace_path = '{}_island{}{}'.format(root, index, extension)
+    if config.ga_config.checkpoint_path is not None:
+        root, extension = os.path.splitext(config.ga_config.checkpoint_path)
+        config.ga_config.checkpoint_path = '{}_island{}{}'.format(root, index, extension)
+    checkpoint = config.ga_config.checkpoint_path
+
+    try:
+        test_factory = TestFactory(analyse_module(module_name))
+        chrom_factory = TestCaseChromosomeFactory(test_factory, TestCaseFactory(test_factory))
+        algorithm = IslandSearchAlgorithm(chrom_factory, index, inbox, outbox)
+        algorithm.simulation = simulation
+        best = algorithm.generate_tests(resume=checkpoint if resume and is_resumable(checkpoint) else None)
+    except Exception:
+        # the neighbour must not wait for emigrants that never come
+        outbox.put(None)
+        results.put((index, None, traceback.format_exc()))
+        return
+    results.put((index, best, None))
+
+
+class IslandModel:
+    """Runs config.ga_config.islands independent populations, one per process, with ring migration."""
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, module_name: str, simulation: Simulation | None = None):
+        self.module_name = module_name
+        self.simulation = simulation
+
+    def run(self, resume: bool = False) -> list[TestCaseChromosome]:
+        """Return the best individual of every island, without its TestFactory.
+
+        With resume, every island picks up its own checkpoint if the island did not finish.
+        """
+        islands = config.ga_config.islands
+        queues = [multiprocessing.Queue() for _ in range(islands)]
+        results = multiprocessing.Queue()
+        seed = randomness.RNG.get_seed()
+
+        processes = []
+        for index in range(islands):
+            process = multiprocessing.Process(target=_run_island, name='island{}'.format(index),
+                                              args=(index, self.module_name, self.simulation, seed, resume,
+                                                    queues[index], queues[(index + 1) % islands], results))
+            process.start()
+            processes.append(process)
+        self.logger.info("started %d islands", islands)
+
+        best = [None] * islands
+        pending = set(range(islands))
+        try:
+            while pending:
+                try:
+                    index, chrom, error = results.get(timeout=1)
+                except queue.Empty:
+                    # a process flushes its result before it exits, one that exited with nothing queued died
+                    dead = [index for index in pending if processes[index].exitcode is not None]
+                    if dead and results.empty():
+                        raise RuntimeError("island {} exited with code {} and no result".format(
+                            dead[0], processes[dead[0]].exitcode))
+                    continue
+                if error is not None:
+                    raise RuntimeError("island {} failed:\n{}".format(index, error))
+                best[index] = chrom
+                pending.discard(index)
+        except BaseException:
+            # the other islands would wait for emigrants of the failed one, stop them all
+            for process in processes:
+                process.terminate()
+                process.join()
+            raise
+        # emigrants sent to an island that already retired are never read, drain them so the senders can exit
+        for process in processes:
+            while process.is_alive():
+                for q in queues:
+                    try:
+                        while True:
+                            q.get_nowait()
+                    except queue.Empty:
+                        pass
+                process.join(timeout=0.1)
+        return best
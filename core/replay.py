@@ -0,0 +1,133 @@
+from __future__ import annotations
+import ast
+import json
+import logging
+import os
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Iterable, Iterator
+import core.statement as stmt
+from core.algorithm import collides_with_npc, _init_worker, _simulate
+from core.archive import ScenarioArchive
+from core.chromosome import TestCaseChromosome
+from core.genome import create_test_case
+if TYPE_CHECKING:
+    from core.factory import TestFactory
+    from core.simulation import Simulation
+
+
+def read_results(path: str) -> Iterator[dict]:
+    """Stream the records of a result file, newline-delimited JSON or the older str(dict) lines"""
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            yield json.loads(line) if path.endswith('.jsonl') else ast.literal_eval(line)
+
+
+def parse_scenario(source: str, test_factory: TestFactory) -> TestCaseChromosome:
+    """Rebuild the chromosome of a scenario rendered by SearchAlgorithm.chrom2string"""
+    test_cluster = test_factory.test_cluster
+    methods = {method.method_name: method for method in test_cluster.road_methods + test_cluster.npc_methods}
+    function = ast.parse(source).body[0]
+    test_case = create_test_case()
+    for node in function.body:
+        match node:
+            case ast.Assign(targets=[ast.Name(id=assignee)], value=ast.Call(func=ast.Name(id=class_name), args=args)):
+                constructor = test_cluster.constructor[class_name]
+                values = [ast.literal_eval(arg) for arg in args]
+                statement = stmt.ConstructorStatement(test_case, constructor.module_name, constructor.class_name,
+                                                      constructor.method_name, dict(zip(constructor.args.keys(), values)),
+                                                      assignee)
+            case ast.Expr(value=ast.Call(func=ast.Attribute(value=ast.Name(id=callee), attr=method_name), args=args)):
+                method = methods[method_name]
+                values = [ast.literal_eval(arg) for arg in args]
+                statement = stmt.MethodStatement(test_case, method.class_name, callee, method_name,
+                                                 dict(zip(method.args.keys(), values)))
+            case _:
+                raise ValueError("unexpected statement in scenario: {}".format(ast.unparse(node)))
+        test_case.append_statement(statement)
+    return TestCaseChromosome(test_case, test_factory)
+
+
+def classify(old_fitness: list, new_fitness: list) -> str:
+    if collides_with_npc(old_fitness):
+        return 'still failing' if collides_with_npc(new_fitness) else 'fixed'
+    if collides_with_npc(new_fitness):
+        return 'new failure'
+    return 'unchanged' if list(old_fitness) == list(new_fitness) else 'changed'
+
+
+class Replay:
+    """Re-evaluates stored scenarios, e.g. the collisions of earlier campaigns after an ADS update.
+
+    Scenarios are streamed from result files or archives, deduplicated by canonical hash and evaluated on a pool of workers
+    processes with at most two scenarios per worker in flight. Every result is written to the report
+    as one JSON line with the old and the new fitness and a status: 'fixed', 'still failing',
+    'new failure', 'changed' or 'unchanged'.
+    """
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, simulation: Simulation, test_factory: TestFactory, workers: int = 1):
+        self.simulation = simulation
+        self.test_factory = test_factory
+        self.workers = workers
+
+    def load(self, path: str, only_collisions: bool = True) -> Iterator[tuple[list, TestCaseChromosome]]:
+        """Stream (fitness, chromosome) from a result file or from the directory of a ScenarioArchive"""
+        if os.path.isdir(path):
+            for chrom in ScenarioArchive(path).chromosomes(self.test_factory):
+                if not only_collisions or collides_with_npc(chrom.fitness):
+                    yield chrom.fitness, chrom
+            return
+        for record in read_results(path):
+            # only the collisions are parsed
+            if not only_collisions or collides_with_npc(record['fitness']):
+                yield record['fitness'], parse_scenario(record['scenario'], self.test_factory)
+
+    @staticmethod
+    def unique(scenarios: Iterable[tuple[list, TestCaseChromosome]]) -> Iterator[tuple[list, TestCaseChromosome]]:
+        seen = set()
+        for fitness, chrom in scenarios:
+            key = chrom.canonical_hash()
+            if key in seen:
+                continue
+            seen.add(key)
+            yield fitness, chrom
+
+    def evaluate(self, scenarios: Iterable[tuple[list, TestCaseChromosome]]) -> Iterator[tuple[list, TestCaseChromosome, list]]:
+        """Yield (old fitness, chromosome, new fitness) in input order"""
+        if self.workers <= 1:
+            for old_fitness, chrom in scenarios:
+                yield old_fitness, chrom, self.simulation.sim(chrom)
+            return
+
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                 initargs=(self.simulation,)) as executor:
+            in_flight = deque()
+            for old_fitness, chrom in scenarios:
+                in_flight.append((old_fitness, chrom, executor.submit(_simulate, chrom, False)))
+                if len(in_flight) >= 2 * self.workers:
+                    old_fitness, chrom, future = in_flight.popleft()
+                    yield old_fitness, chrom, future.result()[0]
+            while in_flight:
+                old_fitness, chrom, future = in_flight.popleft()
+                yield old_fitness, chrom, future.result()[0]
+
+    def run(self, paths: list[str], report_path: str, only_collisions: bool = True) -> Counter:
+        scenarios = self.unique(scenario for path in paths for scenario in self.load(path, only_collisions))
+        counts = Counter()
+        os.makedirs(os.path.dirname(os.path.abspath(report_path)), exist_ok=True)
+        with open(report_path, 'w') as report:
+            for old_fitness, chrom, new_fitness in self.evaluate(scenarios):
+                status = classify(old_fitness, new_fitness)
+                counts[status] += 1
+                report.write(json.dumps({
+                    'status': status,
+                    'old_fitness': old_fitness,
+                    'new_fitness': [float(value) for value in new_fitness],
+                    'scenario': chrom.to_source()
+                }) + '\n')
+        self.logger.info("replayed %d scenarios: %s", sum(counts.values()), dict(counts))
+        return counts
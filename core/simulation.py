@@ -0,0 +1,27 @@
+from __future__ import annotations
+import asyncio
+from abc import ABCMeta, abstractmethod
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from core.chromosome import TestCaseChromosome
+
+
+class Simulation(metaclass=ABCMeta):
+    """Backend that runs the scenario of a chromosome and scores it.
+
+    Backends that can load many scenarios into one session may additionally define
+    sim_batch(chroms, is_avfuzzer) returning one fitness vector per chromosome, in order.
+    SearchAlgorithm detects it and prefers it over per-chromosome calls.
+    """
+
+    @abstractmethod
+    def sim(self, chrom: TestCaseChromosome, is_avfuzzer: bool = False) -> list:
+        """Simulate the scenario and return its fitness vector"""
+
+    async def sim_async(self, chrom: TestCaseChromosome, is_avfuzzer: bool = False) -> list:
+        """Awaitable variant of sim.
+
+        Backends that wait on the simulator over a socket should override this with a native
+        coroutine, the default just runs the blocking sim in a worker thread.
+        """
+        return await asyncio.to_thread(self.sim, chrom, is_avfuzzer)
@@ -0,0 +1,190 @@
+from __future__ import annotations
+import logging
+import numpy as np
+from typing import TYPE_CHECKING
+import core.statement as stmt
+from core.simulation import Simulation
+if TYPE_CHECKING:
+    from core.chromosome import TestCaseChromosome
+
+VEHICLE_LENGTH = 4.313
+VEHICLE_WIDTH = 1.785
+TRANSITION_LENGTH = 20.0  # length of the roads RoadConverter.connect inserts between two roads
+FAR = 100.0  # reported instead of infinite distances and time to collision
+
+
+class KinematicSimulation(Simulation):
+    """Stand-in backend that integrates the scenario of a chromosome without an external simulator.
+
+    Roads are chained clothoids built from the Road constructor arguments with a transition of
+    TRANSITION_LENGTH metres between two roads, vehicles are spawned at their frenet (s, t) position
+    and the NPC actions are executed once their trigger_time is reached. All vehicles are advanced
+    together as NumPy arrays with a fixed time step. The ego plays the ADS: it keeps its lane and
+    follows the vehicle ahead with the intelligent driver model.
+
+    The fitness vector has the layout record_metric expects, every entry is minimised:
+    [bounding box gap between ego and the closest NPC (0 on contact), minimum centre distance,
+    minimum lateral clearance of the ego centre to the road edge, minimum time to collision].
+    """
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, duration: float = 20.0, time_step: float = 0.1, ego_speed: float = 12.0,
+                 ego_max_acc: float = 2.0, ego_comfort_dec: float = 3.0, ego_max_dec: float = 8.0,
+                 time_headway: float = 1.5, min_gap: float = 2.0, grid_step: float = 0.5):
+        self.duration = duration
+        self.time_step = time_step
+        self.ego_speed = ego_speed
+        self.ego_max_acc = ego_max_acc
+        self.ego_comfort_dec = ego_comfort_dec
+        self.ego_max_dec = ego_max_dec
+        self.time_headway = time_headway
+        self.min_gap = min_gap
+        self.grid_step = grid_step
+
+    def build_road(self, chrom: TestCaseChromosome):
+        """Sample the centerline and the drivable width of the chained roads on a regular s grid"""
+        test_case = chrom.test_case
+        offsets = []
+        segments = []
+        s = 0.0
+        for i, road in enumerate(test_case.road_constructors):
+            offsets.append(s)
+            length = road.args['length']
+            segments.append((s, s + length, road.args['curv_start'], road.args['curv_end']))
+            s += length
+            if i + 1 < test_case.road_size():
+                following = test_case.road_constructors[i + 1]
+                segments.append((s, s + TRANSITION_LENGTH, road.args['curv_end'], following.args['curv_start']))
+                s += TRANSITION_LENGTH
+
+        grid = np.arange(0.0, s + self.grid_step, self.grid_step)
+        curvature = np.zeros_like(grid)
+        for start, end, curv_start, curv_end in segments:
+            mask = (grid >= start) & (grid <= end)
+            curvature[mask] = curv_start + (curv_end - curv_start) * (grid[mask] - start) / (end - start)
+        heading = np.concatenate(([0.0], np.cumsum(curvature[:-1] * self.grid_step)))
+        x = np.concatenate(([0.0], np.cumsum(np.cos(heading[:-1]) * self.grid_step)))
+        y = np.concatenate(([0.0], np.cumsum(np.sin(heading[:-1]) * self.grid_step)))
+
+        width = np.zeros_like(grid)
+        for i, road in enumerate(test_case.road_constructors):
+            lanes = np.full(grid.shape, road.args['lane_num'], dtype=float)
+            method = None
+            for st in test_case.road_statements:
+                if isinstance(st, stmt.MethodStatement) and st.callee == road.assignee:
+                    method = st
+            if method is not None and method.method_name in ['contract', 'expand']:
+                changed = grid >= offsets[i] + method.args['start_position'] + method.args['deformation_length']
+                lanes[changed] += 1 if method.method_name == 'expand' else -1
+            end = offsets[i] + road.args['length'] + (TRANSITION_LENGTH if i + 1 < test_case.road_size() else 0)
+            mask = (grid >= offsets[i]) & (grid <= end)
+            width[mask] = lanes[mask] * road.args['lane_width']
+
+        return np.array(offsets), grid, x, y, heading, width
+
+    def sim(self, chrom: TestCaseChromosome, is_avfuzzer: bool = False) -> list:
+        test_case = chrom.test_case
+        offsets, grid, road_x, road_y, road_heading, road_width = self.build_road(chrom)
+        lane_width = test_case.road_constructors[0].args['lane_width']
+
+        vehicles = [st for st in test_case.statements
+                    if isinstance(st, stmt.ConstructorStatement) and st.class_name == 'NPC']
+        names = [st.assignee for st in vehicles]
+        ego = names.index('Ego') if 'Ego' in names else 0
+        road_ids = np.clip([st.args['road_id'] for st in vehicles], 0, len(offsets) - 1)
+        s = offsets[road_ids] + np.array([st.args['init_s'] for st in vehicles], dtype=float)
+        t = np.array([st.args['init_t'] for st in vehicles], dtype=float)
+        v = np.array([st.args['init_speed'] for st in vehicles], dtype=float)
+        npc = np.arange(len(vehicles)) != ego
+
+        # longitudinal controller: every vehicle tracks a target speed with a bounded rate
+        target_speed = v.copy()
+        speed_rate = np.full(len(vehicles), np.inf)
+        # lateral controller: cubic transition from lat_from to lat_to
+        lat_from = t.copy()
+        lat_to = t.copy()
+        lat_start = np.zeros(len(vehicles))
+        lat_duration = np.ones(len(vehicles))
+
+        actions = sorted((st for st in test_case.statements
+                          if isinstance(st, stmt.MethodStatement) and st.class_name == 'NPC' and st.callee in names),
+                         key=lambda st: st.args['trigger_time'])
+        next_action = 0
+
+        min_gap = FAR
+        min_distance = FAR
+        min_clearance = FAR
+        min_ttc = FAR
+        for time in np.arange(0.0, self.duration, self.time_step):
+            while next_action < len(actions) and actions[next_action].args['trigger_time'] <= time:
+                action = actions[next_action]
+                i = names.index(action.callee)
+                lane_center = (np.floor(t[i] / lane_width) + 0.5) * lane_width
+                if action.method_name == 'speedAction':
+                    target_speed[i] = max(action.args['target_speed'], 0.0)
+                    speed_rate[i] = action.args['rate'] if action.args['rate'] > 0 else np.inf
+                elif action.method_name == 'laneChangeAction':
+                    lat_from[i], lat_start[i] = t[i], time
+                    lat_to[i] = lane_center + action.args['relative_target_lane'] * lane_width + \
+                        action.args['target_lane_offset']
+                    lat_duration[i] = max(action.args['lane_change_time'], self.time_step)
+                elif action.method_name == 'laneOffsetAction':
+                    lat_from[i], lat_start[i] = t[i], time
+                    lat_to[i] = lane_center + action.args['offset_distance']
+                    # a cubic transition over T seconds peaks at 6 * d / T^2 lateral acceleration
+                    acc = max(action.args['max_lateral_acc'], 1e-3)
+                    lat_duration[i] = max(np.sqrt(6 * abs(lat_to[i] - t[i]) / acc), self.time_step)
+                next_action += 1
+
+            # the ego follows the closest vehicle ahead that overlaps its lane
+            ds = s - s[ego]
+            dt = t - t[ego]
+            ahead = npc & (ds > 0) & (np.abs(dt) < VEHICLE_WIDTH)
+            ego_acc = self.ego_max_acc * (1 - (v[ego] / self.ego_speed) ** 4)
+            if ahead.any():
+                leader = np.flatnonzero(ahead)[np.argmin(ds[ahead])]
+                gap = max(ds[leader] - VEHICLE_LENGTH, 0.1)
+                desired = self.min_gap + v[ego] * self.time_headway + \
+                    v[ego] * (v[ego] - v[leader]) / (2 * np.sqrt(self.ego_max_acc * self.ego_comfort_dec))
+                ego_acc -= self.ego_max_acc * (max(desired, 0.0) / gap) ** 2
+            target_speed[ego] = max(v[ego] + max(ego_acc, -self.ego_max_dec) * self.time_step, 0.0)
+            speed_rate[ego] = np.inf
+
+            step = np.clip(target_speed - v, -speed_rate * self.time_step, speed_rate * self.time_step)
+            v = np.maximum(v + step, 0.0)
+            s = s + v * self.time_step
+            progress = np.clip((time - lat_start) / lat_duration, 0.0, 1.0)
+            t = lat_from + (lat_to - lat_from) * progress * progress * (3 - 2 * progress)
+
+            # criticality of this step
+            if npc.any():
+                ds = s[npc] - s[ego]
+                dt = t[npc] - t[ego]
+                box_gap = np.hypot(np.maximum(np.abs(ds) - VEHICLE_LENGTH, 0.0),
+                                   np.maximum(np.abs(dt) - VEHICLE_WIDTH, 0.0))
+                x, y = self.to_cartesian(s, t, grid, road_x, road_y, road_heading)
+                distance = np.hypot(x[npc] - x[ego], y[npc] - y[ego])
+                same_lane = np.abs(dt) < VEHICLE_WIDTH
+                closing = np.where(ds > 0, v[ego] - v[npc], v[npc] - v[ego])
+                ttc = np.where(same_lane & (closing > 0), np.maximum(np.abs(ds) - VEHICLE_LENGTH, 0.0) /
+                               np.where(closing > 0, closing, 1.0), FAR)
+                min_gap = min(min_gap, float(box_gap.min()))
+                min_distance = min(min_distance, float(distance.min()))
+                min_ttc = min(min_ttc, float(ttc.min()))
+
+            width = np.interp(s[ego], grid, road_width)
+            min_clearance = min(min_clearance, float(min(-t[ego], t[ego] + width)))
+
+            if min_gap == 0.0:
+                # the run ends at the first collision, like on the real simulator
+                break
+
+        return [min_gap, min_distance, min_clearance, min_ttc]
+
+    @staticmethod
+    def to_cartesian(s: np.ndarray, t: np.ndarray, grid: np.ndarray, road_x: np.ndarray, road_y: np.ndarray,
+                     road_heading: np.ndarray):
+        heading = np.interp(s, grid, road_heading)
+        x = np.interp(s, grid, road_x) - t * np.sin(heading)
+        y = np.interp(s, grid, road_y) + t * np.cos(heading)
+        return x, y
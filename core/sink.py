@@ -0,0 +1,95 @@
+from __future__ import annotations
+import json
+import logging
+import os
+import queue
+import threading
+
+_STOP = object()
+
+
+def _to_json(value):
+    # fitness vectors of the simulators may hold numpy scalars
+    if hasattr(value, 'item'):
+        return value.item()
+    raise TypeError("{} is not JSON serializable".format(type(value).__name__))
+
+
+class ResultSink:
+    """Appends records to newline-delimited JSON files from a background thread.
+
+    put only enqueues, the writer thread drains the queue in batches of up to flush_size records and
+    flushes the touched files once per batch. The queue is bounded, put blocks while it is full so a
+    slow file system throttles the search instead of exhausting memory.
+    """
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, directory: str, max_queue: int = 1024, flush_size: int = 256, flush_interval: float = 1.0):
+        self.directory = directory
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._files = {}
+        self._error: BaseException | None = None
+        self._thread = threading.Thread(target=self._run, name='result-sink', daemon=True)
+        os.makedirs(directory, exist_ok=True)
+        self._thread.start()
+
+    @property
+    def depth(self) -> int:
+        """Records waiting for the writer thread"""
+        return self._queue.qsize()
+
+    def put(self, file_name: str, record: dict):
+        if self._error is not None:
+            raise RuntimeError("the result sink failed") from self._error
+        self._queue.put((file_name, record))
+
+    def flush(self):
+        """Block until every record put so far is written and flushed"""
+        self._queue.join()
+        if self._error is not None:
+            raise RuntimeError("the result sink failed") from self._error
+
+    def close(self):
+        if not self._thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def _run(self):
+        stop = False
+        while not stop:
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            while len(batch) < self.flush_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if _STOP in batch:
+                stop = True
+            try:
+                self._write([item for item in batch if item is not _STOP])
+            except BaseException as e:
+                self.logger.exception("writing %d records failed", len(batch))
+                self._error = e
+            for _ in batch:
+                self._queue.task_done()
+        for f in self._files.values():
+            f.close()
+        self._files.clear()
+
+    def _write(self, batch: list[tuple[str, dict]]):
+        touched = set()
+        for file_name, record in batch:
+            f = self._files.get(file_name)
+            if f is None:
+                f = open(os.path.join(self.directory, file_name), 'a')
+                self._files[file_name] = f
+            f.write(json.dumps(record, default=_to_json) + '\n')
+            touched.add(f)
+        for f in touched:
+            f.flush()
@@ -1,6 +1,8 @@
 from __future__ import annotations
 import ast
 import copy
+import logging
+import weakref
 import numpy as np
 from abc import ABCMeta, abstractmethod
 from typing import TYPE_CHECKING
@@ -47,18 +49,47 @@ def polynomial_mutate(ori_var: list, lb: list, ub: list, distribution, prob):
     return mut_var.tolist()
 
 class Statement(metaclass=ABCMeta):
+    """A call of the scenario module, its AST node is built on the first access of ast_node"""
+    __slots__ = ('_test_case', '_ast_node', '_args', '_assignee', '_callee', '_class_name', '_shared')
+    logger = logging.getLogger(__name__)
 
     def __init__(self, test_case: tc.TestCase):
-        self._test_case = test_case
+        # weak, a statement shared by clones must not keep the test cases they were cloned from alive
+        self._test_case = weakref.ref(test_case)
         self._ast_node = None
         self._args = None
         self._assignee = None
         self._callee = None
         self._class_name = None
+        # set once a clone of the test case refers to this statement too, see TestCase.writable
+        self._shared = False
 
     @property
-    def test_case(self):
-        return self._test_case
+    def test_case(self) -> tc.TestCase | None:
+        """The test case this statement was created for, None once it is gone or after unpickling"""
+        return self._test_case() if self._test_case is not None else None
+
+    def __getstate__(self):
+        # the owner is left out, so a pickled chromosome does not carry its lineage along
+        return {name: getattr(self, name) for cls in type(self).__mro__ for name in getattr(cls, '__slots__', ())
+                if name != '_test_case'}
+
+    def __setstate__(self, state):
+        self._test_case = None
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    def bind(self, test_case: tc.TestCase):
+        """Make test_case the owner of this statement, see TestCase.__setstate__"""
+        self._test_case = weakref.ref(test_case)
+
+    @property
+    def shared(self) -> bool:
+        return self._shared
+
+    @shared.setter
+    def shared(self, val: bool):
+        self._shared = val
 
     @property
     def class_name(self):
@@ -71,6 +102,7 @@ class Statement(metaclass=ABCMeta):
     @assignee.setter
     def assignee(self, val):
         self._assignee = val
+        self._ast_node = None
 
     @property
     def callee(self):
@@ -79,6 +111,7 @@ class Statement(metaclass=ABCMeta):
     @callee.setter
     def callee(self, val):
         self._callee = val
+        self._ast_node = None
 
     @property
     def args(self):
@@ -86,15 +119,29 @@ class Statement(metaclass=ABCMeta):
 
     @property
     def ast_node(self):
+        if self._ast_node is None:
+            self._ast_node = self.build_ast()
         return self._ast_node
 
     @abstractmethod
     def clone(self, test_case: tc.TestCase):
         """Deep clone a statement"""
 
-    @abstractmethod
     def stmt_to_ast(self):
-        """Translate this statement to an AST node."""
+        """Translate this statement to an AST node now, rather than on the first access of ast_node"""
+        self._ast_node = self.build_ast()
+
+    def invalidate_ast(self):
+        """Drop the AST node after changing the args in place, it is rebuilt when next read"""
+        self._ast_node = None
+
+    @abstractmethod
+    def build_ast(self) -> ast.stmt:
+        """Return a new AST node of this statement"""
+
+    @abstractmethod
+    def canonical_key(self) -> tuple:
+        """Identify the class, callee, method and argument values of this statement"""
 
     @abstractmethod
     def mutate(self):
@@ -102,6 +149,7 @@ class Statement(metaclass=ABCMeta):
 
 
 class ConstructorStatement(Statement):
+    __slots__ = ('_module_name', '_constructor_name')
 
     def __init__(self, test_case: tc.TestCase, module_name: str, class_name: str, constructor_name: str, args: dict, assignee: str):
         super().__init__(test_case)
@@ -111,8 +159,7 @@ class ConstructorStatement(Statement):
         self._constructor_name = constructor_name
         self._args = args
         self._assignee = assignee
-        self._ast_node = None
-        self.callee = constructor_name
+        self._callee = constructor_name
 
 
     def clone(self, test_case: tc.TestCase):
@@ -121,14 +168,17 @@ class ConstructorStatement(Statement):
             clone_args[arg_name] = arg_value
         return ConstructorStatement(test_case, self._module_name, self._class_name, self._constructor_name, clone_args, copy.deepcopy(self._assignee))
 
-    def stmt_to_ast(self):
+    def canonical_key(self) -> tuple:
+        return self._class_name, self._assignee, self._constructor_name, tuple(self._args.values())
+
+    def build_ast(self) -> ast.Assign:
         args = [ast.Constant(value=value) for value in self._args.values()]
         call = ast.Call(
             func=ast.Name(id=self._constructor_name, ctx=ast.Load()),
             args=args,
             keywords=[],
         )
-        self._ast_node = ast.Assign(
+        return ast.Assign(
                 targets=[ast.Name(id=self._assignee, ctx=ast.Load())],
                 value=call,
             )
@@ -152,7 +202,7 @@ class ConstructorStatement(Statement):
             else:
                 self._args[name] = mut_var.pop(0)
 
-        self.stmt_to_ast()
+        self.invalidate_ast()
 
     def mutate(self):
         if self._class_name == 'Road':
@@ -170,12 +220,12 @@ class ConstructorStatement(Statement):
         self._args['init_speed'] = mut_var.pop(0)
 
         # position
-        position_dict = get_surrounding_point(self._test_case)
+        position_dict = get_surrounding_point(self.test_case)
         for key, value in self._args.items():
             if key in ['road_id', 'init_s', 'init_t']:
                 self._args[key] = position_dict[key]
 
-        self.stmt_to_ast()
+        self.invalidate_ast()
 
     def original_mutate(self):
         if self._class_name == 'Road':
@@ -212,15 +262,16 @@ class ConstructorStatement(Statement):
             else:
                 self._args[name] = mut_var.pop(0)
 
-        self.stmt_to_ast()
+        self.invalidate_ast()
 
     def re_sample(self):
         for name, value in self._args.items():
             if name in ['road_id', 'init_s', 'init_t']:
-                self._args[name] = get_random_spawn_point(self._test_case)[name]
-        self.stmt_to_ast()
+                self._args[name] = get_random_spawn_point(self.test_case)[name]
+        self.invalidate_ast()
 
 class MethodStatement(Statement):
+    __slots__ = ('_method_name',)
 
     def __init__(self, test_case: tc.TestCase, class_name: str, callee: str, method_name: str, args: dict):
         super().__init__(test_case)
@@ -228,7 +279,6 @@ class MethodStatement(Statement):
         self._callee = callee
         self._method_name = method_name
         self._args = args
-        self._ast_node = None
 
     @property
     def method_name(self):
@@ -240,7 +290,10 @@ class MethodStatement(Statement):
             clone_args[arg_name] = arg_value
         return MethodStatement(test_case, self.class_name, copy.deepcopy(self.callee), copy.deepcopy(self.method_name), clone_args)
 
-    def stmt_to_ast(self):
+    def canonical_key(self) -> tuple:
+        return self._class_name, self._callee, self._method_name, tuple(self._args.values())
+
+    def build_ast(self) -> ast.Expr:
         args = [ast.Constant(value=value) for value in self._args.values()]
         call = ast.Call(
             func=ast.Attribute(attr=self._method_name,
@@ -249,7 +302,7 @@ class MethodStatement(Statement):
             args=args,
             keywords=[],
         )
-        self._ast_node = ast.Expr(value=call)
+        return ast.Expr(value=call)
 
     def mutate_road_method(self, road: ConstructorStatement):
         road_length = road.args['length']
@@ -281,7 +334,7 @@ class MethodStatement(Statement):
 
         elif self.method_name == 'merge':
             if road_lane_num == 2:
-                print('return because cur road lane num is 2, cannot merge.')
+                self.logger.debug("return because cur road lane num is 2, cannot merge.")
                 return False
             self.args['start_position'] = polynomial_mutate([self.args['start_position']], [0.5 * road_length],
                                                             [road_length - 10.0], config.ga_config.polynomial_distribution,
@@ -307,7 +360,7 @@ class MethodStatement(Statement):
 
             self.args['lanes'] = randomness.next_int(1, int(road_lane_num / 2) + 1)
 
-        self.stmt_to_ast()
+        self.invalidate_ast()
         return True
 
     def avfuzzer_mutate(self):
@@ -330,9 +383,9 @@ class MethodStatement(Statement):
         for name, value in self._args.items():
             if isinstance(value, float):
                 self._args[name] = mut_var.pop(0)
-                print(self._args[name])
+                self.logger.debug("mutated %s to %s", name, self._args[name])
 
-        self.stmt_to_ast()
+        self.invalidate_ast()
 
     def mutate(self):
         var = []
@@ -354,11 +407,11 @@ class MethodStatement(Statement):
         for name, value in self._args.items():
             if isinstance(value, float):
                 self._args[name] = mut_var.pop(0)
-                print(self._args[name])
+                self.logger.debug("mutated %s to %s", name, self._args[name])
 
         # mutate the callee
-        self._callee = randomness.choice(self._test_case.get_callees())
-        self.stmt_to_ast()
+        self.test_case.set_callee(self, randomness.choice(self.test_case.get_callees()))
+        self.invalidate_ast()
 
 
 if __name__ == '__main__':
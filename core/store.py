@@ -0,0 +1,86 @@
+from __future__ import annotations
+import json
+import logging
+import sqlite3
+import time
+
+
+class EvaluationStore:
+    """Durable record of simulated scenarios, shared by every run against the same ADS build.
+
+    Rows are keyed by the canonical test case hash and the ADS version tag, so fitness measured by
+    one campaign (in either mode) is reused by the next one instead of being simulated again.
+    """
+    logger = logging.getLogger(__name__)
+
+    # stay well below SQLITE_MAX_VARIABLE_NUMBER of older sqlite builds
+    _query_chunk = 500
+
+    def __init__(self, path: str, ads_version: str = '', batch_size: int = 64):
+        self._path = path
+        self._ads_version = ads_version
+        self._batch_size = batch_size
+        self._pending: dict[str, tuple] = {}
+
+        self._connection = sqlite3.connect(path)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS evaluations ("
+            " scenario_hash TEXT NOT NULL,"
+            " ads_version TEXT NOT NULL,"
+            " mode TEXT NOT NULL,"
+            " fitness TEXT NOT NULL,"
+            " timestamp REAL NOT NULL,"
+            " PRIMARY KEY (scenario_hash, ads_version))"
+        )
+        self._connection.commit()
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def ads_version(self):
+        return self._ads_version
+
+    def get_many(self, keys: list[str]) -> dict[str, list]:
+        found = {}
+        missing = []
+        for key in keys:
+            if key in self._pending:
+                found[key] = json.loads(self._pending[key][3])
+            else:
+                missing.append(key)
+
+        for start in range(0, len(missing), self._query_chunk):
+            chunk = missing[start: start + self._query_chunk]
+            rows = self._connection.execute(
+                "SELECT scenario_hash, fitness FROM evaluations WHERE ads_version = ? AND scenario_hash IN ({})"
+                .format(', '.join('?' * len(chunk))), [self._ads_version, *chunk])
+            for key, fitness in rows:
+                found[key] = json.loads(fitness)
+        return found
+
+    def get(self, key: str) -> list | None:
+        return self.get_many([key]).get(key)
+
+    def put(self, key: str, fitness: list, mode: str):
+        self._pending[key] = (key, self._ads_version, mode, json.dumps(list(fitness), default=lambda v: v.item()),
+                              time.time())
+        if len(self._pending) >= self._batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+        with self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO evaluations (scenario_hash, ads_version, mode, fitness, timestamp) "
+                "VALUES (?, ?, ?, ?, ?)", self._pending.values())
+        self.logger.info("stored %d evaluations in %s", len(self._pending), self._path)
+        self._pending.clear()
+
+    def close(self):
+        self.flush()
+        self._connection.close()
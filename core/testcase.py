@@ -1,7 +1,7 @@
 from __future__ import annotations
 import abc
 import ast
-import re
+import hashlib
 from abc import ABCMeta
 from itertools import islice
 from configuration import configuration as config
@@ -12,12 +12,36 @@ if TYPE_CHECKING:
     from core.statement import Statement
 
 class TestCase(metaclass=ABCMeta):
+    __slots__ = ('_statements', '_road_statements', '_road_constructors', '_cursor', '_ast_node', '_version',
+                 '_constructors', '_methods', '_vehicles', '_npc_count', '_object_count', '__weakref__')
+
     def __init__(self):
         self._statements: list[Statement] = []
         self._road_statements: list[Statement] = []
         self._road_constructors: list[Statement] = []
+        # indexes kept in step with _statements, so operators need not scan it:
+        # entity -> its constructor, entity -> the methods called on it in statement order,
+        # the NPC constructors (the Ego's too) in statement order, the number of npcN entities and of constructors
+        self._constructors: dict[str, Statement] = {}
+        self._methods: dict[str, list[Statement]] = {}
+        self._vehicles: list[Statement] = []
+        self._npc_count: int = 0
+        self._object_count: int = 0
         self._cursor: int = 0
         self._ast_node = None
+        # bumped by every structural change, lets TestCaseChromosome tell whether its memoized source is stale
+        self._version: int = 0
+
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in TestCase.__slots__ if name != '__weakref__'}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+        # statements are unpickled without an owner, those not shared with another test case are this one's
+        for statement in self._statements:
+            if not statement.shared:
+                statement.bind(self)
 
     @property
     def statements(self) -> list[Statement]:
@@ -31,6 +55,11 @@ class TestCase(metaclass=ABCMeta):
     def road_constructors(self) -> list[Statement]:
         return self._road_constructors
 
+    @property
+    def vehicles(self) -> list[Statement]:
+        """The constructors of NPC, the Ego's first, in statement order"""
+        return self._vehicles
+
     @property
     def cursor(self) -> int:
         return self._cursor
@@ -39,30 +68,151 @@ class TestCase(metaclass=ABCMeta):
     def ast_node(self):
         return self._ast_node
 
+    @property
+    def version(self) -> int:
+        return self._version
+
     def size(self) -> int:
         return len(self._statements)
 
     def road_size(self) -> int:
         return len(self._road_constructors)
 
+    def npc_size(self) -> int:
+        return self._npc_count
+
+    def object_size(self) -> int:
+        """Number of constructor statements, the rest are actions"""
+        return self._object_count
+
+    def action_type_size(self) -> int:
+        """Number of distinct entities the actions are called on"""
+        return len(self._methods)
+
+    def constructor(self, entity: str) -> Statement | None:
+        return self._constructors.get(entity)
+
+    def methods(self, entity: str) -> list[Statement]:
+        """The method statements called on entity, in statement order"""
+        return list(self._methods.get(entity, ()))
+
+    def shape_change(self, road: str) -> Statement | None:
+        """The contract, expand, merge or split of a road, if it has one"""
+        methods = self._methods.get(road)
+        return methods[-1] if methods else None
+
+    def _insert_ordered(self, entries: list[Statement], statement: Statement, index: int):
+        # statement is at index of _statements, entries are in statement order
+        if index >= len(self._statements) - 1:
+            entries.append(statement)
+            return
+        others = {id(entry) for entry in entries}
+        entries.insert(sum(id(other) in others for other in islice(self._statements, index)), statement)
+
+    def _index(self, statement: Statement, index: int):
+        if isinstance(statement, stmt.ConstructorStatement):
+            self._object_count += 1
+            self._constructors[statement.assignee] = statement
+            if statement.class_name == 'NPC':
+                self._insert_ordered(self._vehicles, statement, index)
+            if statement.assignee.startswith('npc'):
+                self._npc_count += 1
+        else:
+            self._insert_ordered(self._methods.setdefault(statement.callee, []), statement, index)
+
+    def _unindex(self, statement: Statement):
+        if isinstance(statement, stmt.ConstructorStatement):
+            self._object_count -= 1
+            if self._constructors.get(statement.assignee) is statement:
+                del self._constructors[statement.assignee]
+            if statement.class_name == 'NPC':
+                self._vehicles.remove(statement)
+            if statement.assignee.startswith('npc'):
+                self._npc_count -= 1
+        else:
+            methods = self._methods[statement.callee]
+            methods.remove(statement)
+            if not methods:
+                del self._methods[statement.callee]
+
+    @staticmethod
+    def _insert_position(statements: list, position: int) -> int:
+        # where list.insert(position, ...) puts an element
+        return max(0, len(statements) + position) if position < 0 else min(position, len(statements))
+
     def clone(self, start: int = 0, stop: int | None = None) -> TestCase:
+        """Copy on write, the clone refers to the statements of this test case until it writes to them"""
         test_case = TestCase()
         for statement in islice(self._statements, start, stop):
-            clone_statement: stmt.Statement = statement.clone(test_case)
-            clone_statement.stmt_to_ast()
-            test_case._statements.append(clone_statement)
-
-            if statement.class_name == 'Road':
-                if isinstance(statement, stmt.ConstructorStatement):
-                    test_case.road_constructors.append(clone_statement)
-                test_case._road_statements.append(clone_statement)
+            statement.shared = True
+            test_case.append_statement(statement)
         return test_case
 
+    def writable(self, statement: Statement) -> Statement:
+        """The statement to change in place, a private copy of it if it is shared with another test case"""
+        if not statement.shared and statement.test_case is self:
+            return statement
+        copy = statement.clone(self)
+        for statements in (self._statements, self._road_statements, self._road_constructors, self._vehicles,
+                           self._methods.get(statement.callee, ())):
+            for index, other in enumerate(statements):
+                if other is statement:
+                    statements[index] = copy
+        if isinstance(statement, stmt.ConstructorStatement) and self._constructors.get(statement.assignee) is statement:
+            self._constructors[statement.assignee] = copy
+        return copy
+
+    def rename_entity(self, old: str, new: str):
+        """Rename the constructor of an entity and the methods called on it"""
+        if old == new:
+            return
+        if new in self._constructors:
+            raise ValueError("cannot rename {} to {}, the name is taken".format(old, new))
+        self._version += 1
+        # private copies first, writable finds statements in the indexes by their current names
+        constructor = self._constructors.get(old)
+        if constructor is not None:
+            constructor = self.writable(constructor)
+        for method in self._methods.get(old, ()):
+            self.writable(method)
+
+        if constructor is not None:
+            del self._constructors[old]
+            constructor.assignee = new
+            self._constructors[new] = constructor
+            self._npc_count += new.startswith('npc') - old.startswith('npc')
+        if old in self._methods:
+            methods = self._methods.pop(old)
+            for method in methods:
+                method.callee = new
+            if new in self._methods:
+                # methods left behind by a constructor deleted earlier
+                position = {id(statement): index for index, statement in enumerate(self._statements)}
+                methods = sorted(self._methods[new] + methods, key=lambda statement: position[id(statement)])
+            self._methods[new] = methods
+
+    def set_callee(self, statement: stmt.MethodStatement, callee: str):
+        """Call a method statement of this test case on another entity"""
+        self._unindex(statement)
+        statement.callee = callee
+        self._index(statement, self._statements.index(statement))
+
+    def append_statement(self, statement: Statement):
+        """Add a statement after the last one, for building a test case in statement order"""
+        self._version += 1
+        self._statements.append(statement)
+        self._index(statement, len(self._statements) - 1)
+        if statement.class_name == 'Road':
+            if isinstance(statement, stmt.ConstructorStatement):
+                self._road_constructors.append(statement)
+            self._road_statements.append(statement)
+
     def get_statement(self, position: int) -> Statement:
         assert 0 <= position < len(self._statements)
         return self._statements[position]
 
     def add_statement(self, statement: Statement, position: int = -1):
+        self._version += 1
         if statement.class_name == 'Road':
             if isinstance(statement, stmt.ConstructorStatement):
 
@@ -76,50 +226,68 @@ class TestCase(metaclass=ABCMeta):
                         global_position += 1
                 self._road_statements.insert(global_position, statement)
                 self._statements.insert(global_position, statement)
+                self._index(statement, global_position)
 
                 return global_position
 
             elif isinstance(statement, stmt.MethodStatement):
+                index = self._insert_position(self._statements, position)
                 self._road_statements.insert(position, statement)
                 self._statements.insert(position, statement)
+                self._index(statement, index)
 
                 return position
 
         elif statement.class_name == 'NPC':
+            index = self._insert_position(self._statements, position)
             self._statements.insert(position, statement)
+            self._index(statement, index)
+
+    def remove_statement(self, statement: Statement):
+        self._version += 1
+        self._statements.remove(statement)
+        self._unindex(statement)
+        if statement in self._road_statements:
+            self._road_statements.remove(statement)
 
     def delete_road(self, statement: stmt.ConstructorStatement):
+        self._version += 1
 
-        for st in self._road_statements:
-            if isinstance(st, stmt.MethodStatement) and st.callee == statement.assignee:
+        for st in self.methods(statement.assignee):
+            if st in self._road_statements:
                 self._road_statements.remove(st)
                 self._statements.remove(st)
+                self._unindex(st)
 
         self._road_constructors.remove(statement)
         self._road_statements.remove(statement)
         self._statements.remove(statement)
+        self._unindex(statement)
 
     def delete_method_statement(self, statement: stmt.MethodStatement):
+        self._version += 1
         if len(self._statements) > config.ga_config.min_testcase_size:
             self._statements.remove(statement)
+            self._unindex(statement)
 
     def delete_constructor_statement(self, statement: stmt.ConstructorStatement):
-        for other_statement in reversed(self._statements):
-            if isinstance(other_statement, stmt.MethodStatement):
-                if other_statement.callee == statement.assignee:
-                    self.delete_method_statement(other_statement)
+        self._version += 1
+        for method in reversed(self.methods(statement.assignee)):
+            self.delete_method_statement(method)
 
         if len(self._statements) > config.ga_config.min_testcase_size:
             self._statements.remove(statement)
+            self._unindex(statement)
             if statement in self._road_statements:
                 self._road_statements.remove(statement)
 
+    def canonical_hash(self) -> str:
+        """Hash the statement list, equal for test cases that render to the same scenario"""
+        keys = tuple(statement.canonical_key() for statement in self._statements)
+        return hashlib.sha1(repr(keys).encode()).hexdigest()
+
     def get_callees(self) -> list[str]:
-        callees = []
-        for statement in self._statements:
-            if isinstance(statement, stmt.ConstructorStatement) and re.match('npc', statement.assignee) is not None:
-                callees.append(statement.assignee)
-        return callees
+        return [vehicle.assignee for vehicle in self._vehicles if vehicle.assignee.startswith('npc')]
 
     def test_case_to_ast(self) -> ast.Module:
         function_node_body = []
@@ -1,19 +1,33 @@
-from core.parse_module import TestCluster, analyse_module
+from core.parse_module import analyse_module
 from core.factory import TestFactory, TestCaseFactory, TestCaseChromosomeFactory
 from core.algorithm import SearchAlgorithm
-import ast
+from core.island import IslandModel
+from core.simulator import KinematicSimulation
+from core.checkpoint import is_resumable
+from configuration import configuration as config
+from utils.logs import setup_logging
 import logging
 
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s  %(filename)s : %(levelname)s  %(message)s', datefmt='%Y-%m-%d %A %H:%M:%S', filename='GA.log', filemode='w')
+setup_logging('GA.log', level=logging.INFO, fmt='%(asctime)s  %(filename)s : %(levelname)s  %(message)s',
+              datefmt='%Y-%m-%d %A %H:%M:%S', sampling=config.ga_config.log_sampling)
 logger = logging.getLogger(__name__)
 
-test_cluster = analyse_module("scenario")
-test_factory = TestFactory(test_cluster)
-test_case_factory = TestCaseFactory(test_factory)
-chrom_factory = TestCaseChromosomeFactory(test_factory, test_case_factory)
-
-algorithm = SearchAlgorithm(chrom_factory)
+# stand-in backend, replace it with the client of the ADS simulator under test
+simulation = KinematicSimulation()
 
 logger.info("start generate tests...")
-result = algorithm.generate_tests()
+if config.ga_config.islands > 1:
+    # every island builds its own search and checkpoints to a file of its own, the parent only hosts them
+    result = IslandModel("scenario", simulation).run(resume=True)
+else:
+    test_cluster = analyse_module("scenario")
+    test_factory = TestFactory(test_cluster)
+    test_case_factory = TestCaseFactory(test_factory)
+    chrom_factory = TestCaseChromosomeFactory(test_factory, test_case_factory)
+
+    algorithm = SearchAlgorithm(chrom_factory)
+    algorithm.simulation = simulation
+    # a run that was interrupted picks up from its last checkpoint, a finished one starts over
+    checkpoint = config.ga_config.checkpoint_path
+    result = algorithm.generate_tests(resume=checkpoint if is_resumable(checkpoint) else None)
@@ -1,8 +1,6 @@
 import logging
-import ast
 from utils import randomness
 from core.chromosome import TestCaseChromosome
-import core.statement as stmt
 
 class MultiPointCrossover:
     logger = logging.getLogger(__name__)
@@ -18,15 +16,8 @@ class MultiPointCrossover:
 
 
     def crossover(self, parent1: TestCaseChromosome, parent2: TestCaseChromosome):
-        vehicle_num1 = 0
-        vehicle_num2 = 0
-        for statement in parent1.test_case.statements:
-            if isinstance(statement, stmt.ConstructorStatement) and statement.class_name == 'NPC':
-                vehicle_num1 += 1
-
-        for statement in parent2.test_case.statements:
-            if isinstance(statement, stmt.ConstructorStatement) and statement.class_name == 'NPC':
-                vehicle_num2 += 1
+        vehicle_num1 = parent1.vehicle_size()
+        vehicle_num2 = parent2.vehicle_size()
 
         road_positions = []
         for i in range(1, min(parent1.test_case.road_size(), parent2.test_case.road_size())):
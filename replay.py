@@ -0,0 +1,27 @@
+from core.parse_module import analyse_module
+from core.factory import TestFactory
+from core.replay import Replay
+from core.simulator import KinematicSimulation
+from utils.logs import setup_logging
+import argparse
+import logging
+import time
+
+
+parser = argparse.ArgumentParser(description="Re-evaluate the scenarios of earlier runs")
+parser.add_argument('paths', nargs='+',
+                    help="result_<ts>.jsonl files, result_<ts>.txt files of older runs or archive directories")
+parser.add_argument('--report', default="results/replay_{}.jsonl".format(int(time.time())))
+parser.add_argument('--workers', type=int, default=1, help="number of scenarios simulated at once")
+parser.add_argument('--all', action='store_true', help="replay every scenario, not only the collisions with NPCs")
+args = parser.parse_args()
+
+setup_logging('replay.log', level=logging.INFO, fmt='%(asctime)s  %(filename)s : %(levelname)s  %(message)s',
+              datefmt='%Y-%m-%d %A %H:%M:%S')
+logger = logging.getLogger(__name__)
+
+test_factory = TestFactory(analyse_module("scenario"))
+# stand-in backend, replace it with the client of the ADS simulator under test
+replay = Replay(KinematicSimulation(), test_factory, workers=args.workers)
+counts = replay.run(args.paths, args.report, only_collisions=not args.all)
+print(", ".join("{}: {}".format(status, count) for status, count in sorted(counts.items())) or "nothing to replay")
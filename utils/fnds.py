@@ -68,6 +68,12 @@ def calc_crowding_distance(F, filter_out_duplicates=True):
     return crowding
 
 
+def dominated_by_any(F, G):
+    # mask of the rows of F that at least one row of G dominates
+    F, G = F[:, None, :], G[None, :, :]
+    return np.any(np.all(G <= F, axis=2) & np.any(G < F, axis=2), axis=1)
+
+
 def fast_non_dominated_sort(F):
     n = F.shape[0]
     m = F.shape[0]
@@ -142,8 +148,10 @@ def fast_non_dominated_sort(F):
 
     return fronts
 
-F = np.random.random((20, 2))
-print(F)
-fronts = fast_non_dominated_sort(F)
-for k, front in enumerate(fronts):
-    print(k, front)
\ No newline at end of file
+
+if __name__ == '__main__':
+    F = np.random.random((20, 2))
+    print(F)
+    fronts = fast_non_dominated_sort(F)
+    for k, front in enumerate(fronts):
+        print(k, front)
\ No newline at end of file
@@ -0,0 +1,67 @@
+from __future__ import annotations
+import atexit
+import logging
+import logging.handlers
+import multiprocessing
+from collections import defaultdict
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from core.chromosome import TestCaseChromosome
+
+
+class LazySource:
+    """Log argument that renders a chromosome only when the record is formatted.
+
+    Pass it instead of chrom2string(chrom), records dropped by the level or by sampling then never
+    unparse the chromosome. QueueHandler formats the record in the thread that logs it, so what is
+    rendered is the chromosome as it was when logged.
+    """
+    __slots__ = ('chrom',)
+
+    def __init__(self, chrom: TestCaseChromosome):
+        self.chrom = chrom
+
+    def __str__(self):
+        return self.chrom.to_source()
+
+
+class SamplingFilter(logging.Filter):
+    """Let one in N records of a category through, records log their category with extra={'category': ...}"""
+
+    def __init__(self, rates: dict[str, int]):
+        super().__init__()
+        self.rates = rates
+        self._counts = defaultdict(int)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = self.rates.get(getattr(record, 'category', None), 1)
+        if rate <= 1:
+            return True
+        count = self._counts[record.category]
+        self._counts[record.category] = count + 1
+        return count % rate == 0
+
+
+def setup_logging(filename: str, level: int = logging.INFO, fmt: str | None = None, datefmt: str | None = None,
+                  sampling: dict[str, int] | None = None, filemode: str = 'w') -> logging.handlers.QueueListener:
+    """Route the root logger through a queue to a file written by a listener thread.
+
+    Records are filtered and formatted in the calling thread, only the file I/O is moved off it.
+    The queue is a multiprocessing one, so island and evaluation worker processes forked from this
+    one, which inherit the handler but not the listener, still get their records written. The
+    listener is stopped, and the queue drained, when the interpreter exits.
+    """
+    file_handler = logging.FileHandler(filename, mode=filemode)
+    file_handler.setFormatter(logging.Formatter(fmt, datefmt))
+    log_queue = multiprocessing.Queue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    if sampling:
+        queue_handler.addFilter(SamplingFilter(sampling))
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(queue_handler)
+    listener = logging.handlers.QueueListener(log_queue, file_handler)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
@@ -0,0 +1,82 @@
+from __future__ import annotations
+import difflib
+from collections import defaultdict
+import numpy as np
+
+_EMPTY = np.iinfo(np.uint64).max
+
+
+def shingles(text: str) -> np.ndarray:
+    """Encode the characters of text as (character, occurrence) tokens.
+
+    The Jaccard similarity of two token sets is the weighted Jaccard similarity J of the character
+    multisets, and difflib's quick_ratio of the two strings is 2J / (1 + J).
+    """
+    codes = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+    order = np.argsort(codes, kind='stable')
+    ordered = codes[order]
+    # position of every character among the equal characters before it
+    group_start = np.flatnonzero(np.concatenate(([True], ordered[1:] != ordered[:-1])))
+    occurrence = np.arange(len(ordered)) - np.repeat(group_start, np.diff(np.append(group_start, len(ordered))))
+    return (ordered << np.uint64(32)) | occurrence.astype(np.uint64)
+
+
+class BugIndex:
+    """MinHash/LSH index over scenario strings that answers the unique bug check of SearchAlgorithm.
+
+    A scenario is a duplicate if difflib's quick_ratio with a stored one exceeds threshold. Only the
+    scenarios that share an LSH bucket with it are verified with quick_ratio, so a lookup does not
+    scale with the number of stored bugs. With 32 bands of 4 rows, a pair right at the default
+    threshold of 0.8 (Jaccard 2/3) is missed with a probability below 0.1%.
+    """
+
+    def __init__(self, threshold: float = 0.8, num_perm: int = 128, bands: int = 32, seed: int = 1):
+        assert num_perm % bands == 0
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        # the hash functions have their own generator, building an index must not shift the search's random stream
+        generator = np.random.default_rng(seed)
+        self._a = generator.integers(0, _EMPTY, size=num_perm, dtype=np.uint64, endpoint=True) | np.uint64(1)
+        self._b = generator.integers(0, _EMPTY, size=num_perm, dtype=np.uint64, endpoint=True)
+        self._buckets = [defaultdict(list) for _ in range(bands)]
+        self._scenarios: list[str] = []
+
+    def __len__(self):
+        return len(self._scenarios)
+
+    def signature(self, text: str) -> np.ndarray:
+        tokens = shingles(text)
+        if len(tokens) == 0:
+            return np.full(len(self._a), _EMPTY, dtype=np.uint64)
+        # multiply-shift hashing, the products are meant to wrap around
+        with np.errstate(over='ignore'):
+            return ((np.outer(self._a, tokens) + self._b[:, None]) >> np.uint64(32)).min(axis=1)
+
+    def band_keys(self, signature: np.ndarray) -> list[bytes]:
+        return [signature[i * self.rows: (i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def add(self, text: str, signature: np.ndarray | None = None):
+        index = len(self._scenarios)
+        self._scenarios.append(text)
+        signature = self.signature(text) if signature is None else signature
+        for band, key in zip(self._buckets, self.band_keys(signature)):
+            band[key].append(index)
+
+    def find_similar(self, text: str, signature: np.ndarray | None = None) -> str | None:
+        """Return a stored scenario whose quick_ratio with text exceeds the threshold, if there is one"""
+        signature = self.signature(text) if signature is None else signature
+        candidates = set()
+        for band, key in zip(self._buckets, self.band_keys(signature)):
+            candidates.update(band.get(key, ()))
+        for index in sorted(candidates):
+            if difflib.SequenceMatcher(None, self._scenarios[index], text).quick_ratio() > self.threshold:
+                return self._scenarios[index]
+        return None
+
+    def add_if_unique(self, text: str) -> bool:
+        signature = self.signature(text)
+        if self.find_similar(text, signature) is not None:
+            return False
+        self.add(text, signature)
+        return True
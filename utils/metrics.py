@@ -0,0 +1,241 @@
+"""Provides a singleton MetricsRegistry of live counters, gauges and histograms of a search."""
+from __future__ import annotations
+import bisect
+import http.server
+import logging
+import math
+import os
+import threading
+
+# seconds, from a short kinematic simulation to a long run of the ADS simulator
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _format_labels(names: tuple, values: tuple, extra: tuple = ()) -> str:
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join('{}="{}"'.format(name, value) for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, label_names: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+        self._values: dict[tuple, object] = {}
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.label_names):
+            raise ValueError("{} takes the labels {}, got {}".format(self.name, self.label_names, tuple(labels)))
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def _samples(self) -> list[tuple[str, str, float]]:
+        raise NotImplementedError
+
+    def expose(self) -> str:
+        lines = ['# HELP {} {}'.format(self.name, self.documentation), '# TYPE {} {}'.format(self.name, self.kind)]
+        with self._lock:
+            samples = self._samples()
+        lines.extend('{}{} {}'.format(name, labels, _format_value(value)) for name, labels, value in samples)
+        return '\n'.join(lines)
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self):
+        return [(self.name, _format_labels(self.label_names, key), value) for key, value in sorted(self._values.items())]
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """Cumulative buckets, the sum and the count of observations, quantiles are estimated from the buckets"""
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, label_names: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    def quantile(self, q: float, **labels) -> float:
+        """Upper bound of the bucket that holds the q-quantile, the estimate of Prometheus' histogram_quantile"""
+        counts, _ = self._values.get(self._key(labels), (None, 0.0))
+        if not counts or sum(counts) == 0:
+            return math.nan
+        rank = q * sum(counts)
+        seen = 0
+        for bound, count in zip(self.buckets + (math.inf,), counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return math.inf
+
+    def _samples(self):
+        samples = []
+        for key, (counts, total) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                labels = _format_labels(self.label_names, key, (('le', _format_value(bound)),))
+                samples.append((self.name + '_bucket', labels, cumulative))
+            samples.append((self.name + '_sum', _format_labels(self.label_names, key), total))
+            samples.append((self.name + '_count', _format_labels(self.label_names, key), cumulative))
+        return samples
+
+
+class MetricsRegistry:
+    """Named metrics of the running process in the Prometheus text format.
+
+    The exposition is served over HTTP by serve, or rewritten to a file by write, e.g. for the
+    textfile collector of a node exporter. Every update takes a lock of its metric, so the search,
+    the result sink and the HTTP thread can share the registry.
+    """
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, namespace: str = ''):
+        self.namespace = namespace
+        self._metrics: dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+        self._server: http.server.ThreadingHTTPServer | None = None
+        self._exporter: threading.Thread | None = None
+        self._export_stop = threading.Event()
+        # a forked process, e.g. an island, inherits the server and the exporter but not their threads
+        os.register_at_fork(after_in_child=self._forget_threads)
+
+    def _forget_threads(self):
+        if self._server is not None:
+            # the parent keeps serving on the socket, the child only drops its copy
+            self._server.socket.close()
+        self._server = None
+        self._exporter = None
+        self._export_stop = threading.Event()
+
+    def _register(self, cls, name: str, documentation: str, label_names: tuple, **kwargs):
+        name = '{}_{}'.format(self.namespace, name) if self.namespace else name
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, label_names, **kwargs)
+            elif type(metric) is not cls or metric.label_names != tuple(label_names):
+                raise ValueError("{} is already registered as a {} with the labels {}".format(
+                    name, metric.kind, metric.label_names))
+        return metric
+
+    def counter(self, name: str, documentation: str, label_names: tuple = ()) -> Counter:
+        return self._register(Counter, name, documentation, label_names)
+
+    def gauge(self, name: str, documentation: str, label_names: tuple = ()) -> Gauge:
+        return self._register(Gauge, name, documentation, label_names)
+
+    def histogram(self, name: str, documentation: str, label_names: tuple = (),
+                  buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, documentation, label_names, buckets=buckets)
+
+    def reset(self):
+        """Clear the values, the metrics stay registered"""
+        for metric in list(self._metrics.values()):
+            metric.reset()
+
+    def exposition(self) -> str:
+        return '\n'.join(metric.expose() for _, metric in sorted(self._metrics.items())) + '\n'
+
+    def write(self, path: str):
+        """Replace path with the current exposition, readers never see a partial file"""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path + '.tmp', 'w') as f:
+            f.write(self.exposition())
+        os.replace(path + '.tmp', path)
+
+    def serve(self, port: int, host: str = '127.0.0.1'):
+        """Expose the metrics on http://host:port/metrics from a daemon thread"""
+        if self._server is not None:
+            return
+        registry = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = registry.exposition().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, fmt, *args):
+                registry.logger.debug(fmt, *args)
+
+        self._server = http.server.ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name='metrics-http', daemon=True).start()
+        self.logger.info("serving metrics on http://%s:%d/metrics", host, self._server.server_address[1])
+
+    def export(self, path: str, interval: float = 5.0):
+        """Rewrite path with the exposition every interval seconds from a daemon thread"""
+        if self._exporter is not None:
+            return
+        self._export_stop.clear()
+
+        def run():
+            while not self._export_stop.wait(interval):
+                self.write(path)
+            self.write(path)
+
+        self._exporter = threading.Thread(target=run, name='metrics-export', daemon=True)
+        self._exporter.start()
+
+    def stop(self):
+        """Stop serving and exporting, the file is written a last time"""
+        if self._exporter is not None:
+            self._export_stop.set()
+            self._exporter.join()
+            self._exporter = None
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+METRICS: MetricsRegistry = MetricsRegistry('adevos')
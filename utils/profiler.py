@@ -0,0 +1,108 @@
+"""Provides a singleton PhaseTimer that measures where the time of a search goes."""
+from __future__ import annotations
+import json
+import os
+import time
+from collections import defaultdict
+
+
+class _Phase:
+    __slots__ = ('_timer', '_name', '_start')
+
+    def __init__(self, timer: PhaseTimer, name: str):
+        self._timer = timer
+        self._name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._timer.add(self._name, time.perf_counter() - self._start)
+        return False
+
+
+class _NullPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class PhaseTimer:
+    """Accumulates the count and the total seconds of named phases, per generation and per run.
+
+    Disabled, phase returns a shared no-op context manager and count returns at once, so the hooks
+    can stay in the search loop. Phases that run in evaluation worker processes are timed, and kept,
+    in the timer of that process.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._generation: dict[str, list] = defaultdict(lambda: [0, 0.0])
+        self._run: dict[str, list] = defaultdict(lambda: [0, 0.0])
+        self._generations: list[dict] = []
+        self._counters: dict[str, int] = defaultdict(int)
+
+    def enable(self, enabled: bool = True):
+        self.enabled = enabled
+
+    def reset(self):
+        self._generation.clear()
+        self._run.clear()
+        self._generations.clear()
+        self._counters.clear()
+
+    def phase(self, name: str):
+        if not self.enabled:
+            return _NULL_PHASE
+        return _Phase(self, name)
+
+    def add(self, name: str, seconds: float):
+        for stats in (self._generation[name], self._run[name]):
+            stats[0] += 1
+            stats[1] += seconds
+
+    def count(self, name: str, n: int = 1):
+        if self.enabled:
+            self._counters[name] += n
+
+    def end_generation(self, iteration: int):
+        if not self.enabled:
+            return
+        self._generations.append({
+            'iteration': iteration,
+            'phases': {name: {'count': count, 'seconds': seconds} for name, (count, seconds) in self._generation.items()}
+        })
+        self._generation.clear()
+
+    def summary(self) -> str:
+        total = sum(seconds for _, seconds in self._run.values())
+        lines = ['{:<24}{:>10}{:>12}{:>12}{:>8}'.format('phase', 'count', 'total [s]', 'mean [ms]', '%')]
+        for name, (count, seconds) in sorted(self._run.items(), key=lambda item: -item[1][1]):
+            lines.append('{:<24}{:>10}{:>12.3f}{:>12.3f}{:>8.1f}'.format(
+                name, count, seconds, 1000 * seconds / count, 100 * seconds / total if total else 0.0))
+        for name, count in sorted(self._counters.items()):
+            lines.append('{:<24}{:>10}'.format(name, count))
+        return '\n'.join(lines)
+
+    def to_dict(self) -> dict:
+        return {
+            'run': {name: {'count': count, 'seconds': seconds} for name, (count, seconds) in self._run.items()},
+            'counters': dict(self._counters),
+            'generations': self._generations,
+        }
+
+    def dump(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+
+TIMER: PhaseTimer = PhaseTimer()
@@ -0,0 +1,105 @@
+"""Provides a singleton Tracer that records a timeline of a search in the Chrome trace-event format."""
+from __future__ import annotations
+import json
+import os
+import threading
+import time
+from collections import deque
+
+
+class _Span:
+    __slots__ = ('_tracer', '_name', '_category', '_args', '_start')
+
+    def __init__(self, tracer: Tracer, name: str, category: str, args: dict):
+        self._tracer = tracer
+        self._name = name
+        self._category = category
+        self._args = args
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._tracer.complete(self._name, self._category, self._start, time.perf_counter() - self._start, self._args)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """Keeps the latest complete ('X') events of named spans in a ring buffer.
+
+    Events are tagged with the process and thread that ran them. time.perf_counter is the system
+    wide monotonic clock on Linux, so the events recorded by evaluation workers line up with the
+    ones of the search process; a worker drains its buffer into the result of each simulation.
+    Disabled, span returns a shared no-op context manager.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._events: deque = deque(maxlen=100000)
+
+    def enable(self, capacity: int = 100000, enabled: bool = True):
+        self.enabled = enabled
+        if capacity != self._events.maxlen:
+            self._events = deque(self._events, maxlen=capacity)
+
+    def reset(self):
+        self._events.clear()
+
+    def __len__(self):
+        return len(self._events)
+
+    def span(self, name: str, category: str = 'search', **args):
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, category, args)
+
+    def complete(self, name: str, category: str, start: float, seconds: float, args: dict | None = None):
+        """Record a span measured by the caller, start is a time.perf_counter value"""
+        if self.enabled:
+            self._events.append((name, category, start * 1e6, seconds * 1e6, os.getpid(), threading.get_ident(),
+                                 args or None))
+
+    def drain(self) -> list[tuple]:
+        events = list(self._events)
+        self._events.clear()
+        return events
+
+    def extend(self, events: list[tuple]):
+        if self.enabled:
+            self._events.extend(events)
+
+    def to_dict(self) -> dict:
+        events = []
+        names = {}
+        for name, category, ts, dur, pid, tid, args in self._events:
+            event = {'name': name, 'cat': category, 'ph': 'X', 'ts': ts, 'dur': dur, 'pid': pid, 'tid': tid}
+            if args:
+                event['args'] = args
+            events.append(event)
+            names.setdefault(pid, 'search' if pid == os.getpid() else 'worker {}'.format(pid))
+        metadata = [{'name': 'process_name', 'ph': 'M', 'pid': pid, 'tid': 0, 'args': {'name': name}}
+                    for pid, name in names.items()]
+        return {'traceEvents': metadata + events, 'displayTimeUnit': 'ms'}
+
+    def dump(self, path: str):
+        """Write the buffered events as a trace for chrome://tracing or Perfetto"""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f)
+
+
+TRACER: Tracer = Tracer()